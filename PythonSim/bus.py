@@ -0,0 +1,161 @@
+from __future__ import annotations
+
+import operator
+from array import array
+from functools import partial
+
+import numpy as np
+
+from PythonSim.classes import PowerPort, SignalPort
+
+
+class BusPowerPort(PowerPort):
+    # No new slots, so attached ports can switch class in place
+    __slots__ = ()
+
+    @property
+    def effort(self) -> float:
+        return self.bus[self.effort_index]
+
+    @effort.setter
+    def effort(self, value: float):
+        self.bus[self.effort_index] = value
+
+    @property
+    def flow(self) -> float:
+        return self.bus[self.flow_index]
+
+    @flow.setter
+    def flow(self, value: float):
+        self.bus[self.flow_index] = value
+
+    def read_effort(self) -> float:
+        try:
+            return self.bus[self.peer_effort_index]
+        except TypeError:
+            raise TypeError(f"[{self.name}] Read error: port not connected.") from None
+
+    def read_flow(self) -> float:
+        try:
+            return self.bus[self.peer_flow_index]
+        except TypeError:
+            raise TypeError(f"[{self.name}] Read error: port not connected.") from None
+
+
+class BusSignalPort(SignalPort):
+    __slots__ = ()
+
+    @property
+    def signal(self) -> float:
+        return self.bus[self.signal_index]
+
+    @signal.setter
+    def signal(self, value: float):
+        self.bus[self.signal_index] = value
+
+    def read_signal(self) -> float:
+        try:
+            return self.bus[self.peer_signal_index]
+        except TypeError:
+            raise TypeError(f"[{self.name}] Read error: port not connected.") from None
+
+
+# Port methods bound per instance to direct bus array access while attached
+BUS_METHODS = ("read_effort", "read_flow", "write_effort", "write_flow", "read_signal", "write_signal")
+
+
+def bind_bus_fast_paths(port):
+    # Calls into the bus array without going through the value properties, the class
+    # methods stay in place for unconnected reads, which raise
+    if isinstance(port, BusPowerPort):
+        port.write_effort = partial(operator.setitem, port.bus, port.effort_index)
+        port.write_flow = partial(operator.setitem, port.bus, port.flow_index)
+        if port.peer_effort_index is not None:
+            port.read_effort = partial(operator.getitem, port.bus, port.peer_effort_index)
+            port.read_flow = partial(operator.getitem, port.bus, port.peer_flow_index)
+    elif isinstance(port, BusSignalPort):
+        port.write_signal = partial(operator.setitem, port.bus, port.signal_index)
+        if port.peer_signal_index is not None:
+            port.read_signal = partial(operator.getitem, port.bus, port.peer_signal_index)
+
+
+def unbind_bus_fast_paths(port):
+    for method in BUS_METHODS:
+        port.__dict__.pop(method, None)
+
+
+class PortBus:
+    """
+    One contiguous float64 array holding the values of every port in a System.
+
+    Each port owns one slot per value it writes, and reads are aliased to the slots of
+    the port it is connected to. values is a zero-copy NumPy view of the whole bus.
+    """
+
+    def __init__(self, ports: list):
+        self.ports = []
+        self.names: list[str] = []
+        initial = []
+
+        for port in ports:
+            if isinstance(port, PowerPort):
+                self.ports.append(port)
+                self.names += [f"{port.name}.effort", f"{port.name}.flow"]
+                initial += [port.effort, port.flow]
+            elif isinstance(port, SignalPort):
+                self.ports.append(port)
+                self.names.append(f"{port.name}.signal")
+                initial.append(port.signal)
+
+        # array.array indexing returns Python floats, which keeps per-port reads cheap
+        self.data = array("d", [float(value) for value in initial])
+        self.values = np.frombuffer(self.data, dtype=np.float64) if self.data else np.empty(0)
+        self.index = {name: idx for idx, name in enumerate(self.names)}
+
+    def attach(self):
+        idx = 0
+        for port in self.ports:
+            port.bus = self.data
+            if isinstance(port, PowerPort):
+                port.effort_index, port.flow_index = idx, idx + 1
+                port.__class__ = BusPowerPort
+                idx += 2
+            else:
+                port.signal_index = idx
+                port.__class__ = BusSignalPort
+                idx += 1
+
+        # Connections become index aliases onto the peer's slots
+        for port in self.ports:
+            peer = port.connected
+            if isinstance(port, PowerPort):
+                port.peer_effort_index = peer.effort_index if peer in self else None
+                port.peer_flow_index = peer.flow_index if peer in self else None
+            else:
+                port.peer_signal_index = peer.signal_index if peer in self else None
+
+        # Without these, every access would go through a property and be slower than plain ports
+        for port in self.ports:
+            bind_bus_fast_paths(port)
+
+    def detach(self):
+        # Copy the current values back into the ports' own slots
+        for port in self.ports:
+            unbind_bus_fast_paths(port)
+            if isinstance(port, BusPowerPort):
+                effort, flow = port.effort, port.flow
+                port.__class__ = PowerPort
+                port.effort, port.flow = effort, flow
+            elif isinstance(port, BusSignalPort):
+                signal = port.signal
+                port.__class__ = SignalPort
+                port.signal = signal
+
+    def __contains__(self, port) -> bool:
+        return port is not None and getattr(port, "bus", None) is self.data
+
+    def snapshot(self) -> np.ndarray:
+        return self.values.copy()
+
+    def load(self, values):
+        self.values[:] = values
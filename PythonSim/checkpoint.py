@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import pickle
+import zlib
+
+import numpy as np
+
+from PythonSim.classes import Port, PowerPort, SignalPort
+
+CHECKPOINT_VERSION = 1
+
+# Component attributes that describe structure rather than state
+STRUCTURAL_ATTRIBUTES = {"name", "ports", "variables", "signal_ports", "states", "sample_period", "rate_group"}
+
+
+def is_state_value(value) -> bool:
+    if isinstance(value, Port) or callable(value):
+        return False
+    try:
+        pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+    except Exception:
+        return False
+    return True
+
+
+def capture_component(comp) -> dict:
+    return {
+        attr: value for attr, value in vars(comp).items()
+        if attr not in STRUCTURAL_ATTRIBUTES and is_state_value(value)
+    }
+
+
+def capture_ports(comp) -> list:
+    values = []
+    for port in comp.get_ports():
+        if isinstance(port, PowerPort):
+            values.append((port.effort, port.flow))
+        elif isinstance(port, SignalPort):
+            values.append(port.signal)
+        else:
+            values.append(None)
+    return values
+
+
+def capture(system, include_logs: bool = False) -> dict:
+    return {
+        "version": CHECKPOINT_VERSION,
+        "time": system.time,
+        "step_count": system.step_count,
+        "components": [
+            {"name": comp.name, "attributes": capture_component(comp), "ports": capture_ports(comp)}
+            for comp in system.components
+        ],
+        "log_index": system.log_index,
+        "log_names": list(system.log_names),
+        "logs": np.array(system.log_array) if include_logs else None,
+    }
+
+
+def parse_keep(system, keep) -> dict[str, set]:
+    # "motor.k" -> {"motor": {"k"}}, unknown names raise so a typo does not silently restore the old value
+    names = {comp.name: comp for comp in system.components}
+    kept = {}
+    for entry in keep:
+        comp_name, sep, attr = entry.rpartition(".")
+        if not sep or comp_name not in names:
+            raise ValueError(f"keep entry '{entry}' must be 'component.attribute' of a component in the system.")
+        if not hasattr(names[comp_name], attr):
+            raise AttributeError(f"[{comp_name}] has no attribute {attr} to keep.")
+        kept.setdefault(comp_name, set()).add(attr)
+    return kept
+
+
+def apply(system, state: dict, keep=()):
+    if state.get("version") != CHECKPOINT_VERSION:
+        raise ValueError(f"Unsupported checkpoint version {state.get('version')}.")
+    if len(state["components"]) != len(system.components):
+        raise ValueError(f"Checkpoint has {len(state['components'])} components, system has {len(system.components)}.")
+    kept = parse_keep(system, keep)
+
+    for comp, saved in zip(system.components, state["components"]):
+        if comp.name != saved["name"]:
+            raise ValueError(f"[{comp.name}] Checkpoint component mismatch, expected {saved['name']}.")
+        kept_attributes = kept.get(comp.name, ())
+        for attr, value in saved["attributes"].items():
+            if attr not in kept_attributes:
+                setattr(comp, attr, value)
+        for port, value in zip(comp.get_ports(), saved["ports"]):
+            if isinstance(port, PowerPort):
+                port.effort, port.flow = value
+            elif isinstance(port, SignalPort):
+                port.signal = value
+
+    system.time = state["time"]
+    system.step_count = state["step_count"]
+
+
+def dumps(state: dict) -> bytes:
+    return zlib.compress(pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+def loads(data: bytes) -> dict:
+    # Checkpoints are pickles, so only restore ones you created yourself
+    return pickle.loads(zlib.decompress(data))
@@ -1,6 +1,16 @@
 from __future__ import annotations
 
+import math
+import os
+from functools import partial
+
+import numpy as np
+
 class Port:
+    # Slots keep ports small. __dict__ is kept so ports can still take extra attributes,
+    # it is only allocated when one is set (e.g. compiled fast paths).
+    __slots__ = ("name", "__dict__")
+
     def __init__(self, name: str):
         self.name = name
 
@@ -8,6 +18,10 @@ class Port:
         raise NotImplementedError("Subclasses must implement connect method.")
 
 class PowerPort(Port):
+    # The index slots are only used when the port is attached to a PortBus
+    __slots__ = ("effort", "flow", "connected", "bus", "effort_index", "flow_index",
+                 "peer_effort_index", "peer_flow_index")
+
     def __init__(self, name: str):
         super().__init__(name)
 
@@ -38,6 +52,8 @@ class PowerPort(Port):
         else: raise TypeError(f"[{self.name}] Read error: port not connected.")
 
 class SignalPort(Port):
+    __slots__ = ("signal", "connected", "bus", "signal_index", "peer_signal_index")
+
     def __init__(self, name: str):
         super().__init__(name)
 
@@ -64,6 +80,13 @@ class Component:
         self.variables: dict[str, callable] = {}
         self.signal_ports: dict[str, SignalPort] = {}
 
+        # Names of attributes integrated as continuous states, in the order derivatives() returns them
+        self.states: list[str] = []
+
+        # Own sample period in seconds, or the name of a System rate group. None steps at the System dt
+        self.sample_period: float | None = None
+        self.rate_group: str | None = None
+
     def add_port(self, port: Port):
         self.ports.append(port)
 
@@ -86,47 +109,454 @@ class Component:
     def get_logged_variables(self):
         return self.variables
 
+    def add_state(self, name: str):
+        if not hasattr(self, name):
+            raise AttributeError(f"[{self.name}] State {name} must be defined before it is added.")
+        self.states.append(name)
+
+    def is_continuous(self) -> bool:
+        return type(self).derivatives is not Component.derivatives
+
+    def derivatives(self) -> list[float]:
+        # Read inputs, write outputs and return d/dt of each state in self.states
+        raise NotImplementedError("Continuous components must implement the derivatives method.")
+
     def step(self, dt: float):
-        raise NotImplementedError("Each component must implement the step method.")
+        if not self.is_continuous():
+            raise NotImplementedError("Each component must implement the step method.")
+        # Explicit Euler fallback so continuous components also run under fixed-step simulate
+        for name, derivative in zip(self.states, self.derivatives()):
+            setattr(self, name, getattr(self, name) + derivative * dt)
 
 class System:
     def __init__(self):
         self.components: list[Component] = []
-        self.logs: dict[str, list[float]] = {"time": []}
+
+        # Logs live in one preallocated (rows, vars) float64 buffer, column 0 is time
+        self.log_names: list[str] = ["time"]
+        self.log_getters: list[callable] = []
+        self.log_buffer: np.ndarray = np.empty((0, 1))
+        self.log_index = 0
+
+        # Fused step function generated by compile(), None when running uncompiled
+        self.compiled_step: callable | None = None
+
+        # Contiguous port value array built by attach_bus(), None when ports hold their own values
+        self.bus = None
+
+        # Profiler collecting per-component timings, None when profiling is off
+        self.profiler = None
+
+        # Filled by sort_components(): component names per algebraic loop, and the
+        # loops that are solved by fixed-point iteration on every step
+        self.algebraic_loops: list[list[str]] = []
+        self.loop_groups: list = []
+
+        # Multi-rate scheduling: each component steps every rate_divisors[i] base steps
+        self.rate_groups: dict[str, float] = {}
+        self.rate_divisors: list[int] = []
+        self.distinct_divisors: list[int] = []
+        self.rate_schedules: dict[tuple[int, ...], list[tuple[Component, int]]] = {}
+        self.step_count = 0
+
+        # Simulated time reached by the last run, used by checkpoints and resume
+        self.time = 0.0
 
     def add_component(self, comp: Component):
+        self.decompile()
+        self.detach_bus()
         self.components.append(comp)
 
     def connect(self, port1: Port, port2: Port):
+        self.decompile()
+        self.detach_bus()
         port1.connect_port(port2)
         port2.connect_port(port1)
         print(f"[{port1.name}] and [{port2.name}] connected")
 
-    def initialize_logging(self):
+    def add_rate_group(self, name: str, sample_period: float):
+        if sample_period <= 0:
+            raise ValueError(f"Rate group {name} needs a positive sample period.")
+        self.rate_groups[name] = sample_period
+
+    def get_sample_period(self, comp: Component) -> float | None:
+        if comp.sample_period is not None:
+            return comp.sample_period
+        if comp.rate_group is not None:
+            if comp.rate_group not in self.rate_groups:
+                raise KeyError(f"[{comp.name}] Unknown rate group {comp.rate_group}.")
+            return self.rate_groups[comp.rate_group]
+        return None
+
+    def schedule_rates(self, dt: float):
+        # Components step every round(period / dt) base steps and hold their port outputs in between
+        self.rate_divisors = []
         for comp in self.components:
-            for name in comp.get_logged_variables():
-                self.logs[name] = []
+            period = self.get_sample_period(comp)
+            self.rate_divisors.append(1 if period is None else max(1, round(period / dt)))
+        self.distinct_divisors = sorted(set(self.rate_divisors))
+        self.rate_schedules = {}
+        self.step_count = 0
+        if self.compiled_step is not None:
+            self.compile()
 
-    def log_step(self, t: float):
-        self.logs["time"].append(t)
+    def is_multi_rate(self) -> bool:
+        return any(divisor > 1 for divisor in self.rate_divisors)
+
+    def compile(self) -> callable:
+        from PythonSim.compiler import compile_system
+        self.compiled_step = compile_system(self)
+        return self.compiled_step
+
+    def decompile(self):
+        if self.compiled_step is not None:
+            from PythonSim.compiler import decompile_system
+            decompile_system(self)
+            self.compiled_step = None
+
+    def attach_bus(self):
+        """
+        Opt-in: moves every port value into one float64 array (see get_port_state). Port
+        accesses then index that array, which is about as fast as plain ports in compiled
+        systems but roughly 1.3x slower per step without compile(), so only attach a bus
+        where the array view is needed.
+        """
+        from PythonSim.bus import PortBus
+        was_compiled = self.compiled_step is not None
+        self.decompile()
+        self.detach_bus()
+
+        # Ports connected to something outside the System get slots too, so their reads keep working
+        ports = [port for comp in self.components for port in comp.get_ports()]
+        seen = {id(port) for port in ports}
+        for port in list(ports):
+            if port.connected is not None and id(port.connected) not in seen:
+                ports.append(port.connected)
+                seen.add(id(port.connected))
+
+        self.bus = PortBus(ports)
+        self.bus.attach()
+        if was_compiled:
+            self.compile()
+        return self.bus
+
+    def detach_bus(self):
+        if self.bus is not None:
+            self.bus.detach()
+            self.bus = None
+
+    def enable_profiling(self, trace_limit: int = 100_000):
+        from PythonSim.profiling import Profiler
+        self.profiler = Profiler(trace_limit=trace_limit)
+        return self.profiler
+
+    def disable_profiling(self):
+        self.profiler = None
+
+    def profile_report(self, verbose: bool = False) -> list[dict]:
+        if self.profiler is None:
+            raise RuntimeError("Profiling is off. Call enable_profiling() before simulating.")
+        report = self.profiler.report()
+        if verbose:
+            for row in report:
+                print(f"{row['name']:<30} {row['category']:<20} calls: {row['calls']:<10} "
+                      f"total: {row['total_s']:.4f} s | per call: {row['per_call_us']:.2f} us | "
+                      f"share: {row['share']:.1%}")
+        return report
+
+    def export_profile(self, path: str, format: str = "json"):
+        if self.profiler is None:
+            raise RuntimeError("Profiling is off. Call enable_profiling() before simulating.")
+        if format == "json":
+            self.profiler.to_json(path)
+        elif format == "chrome":
+            self.profiler.to_chrome_trace(path)
+        else:
+            raise ValueError(f"Unsupported profile format '{format}'. Use 'json' or 'chrome'.")
+
+    def sort_components(self, resolve_loops: bool = False, max_iterations: int = 20,
+                        tolerance: float = 1e-9) -> list[list[str]]:
+        """
+        Reorders components so each one runs after the components whose port values it reads.
+
+        Dependencies come from the port connections and from which ports each component
+        reads and writes in its methods. Components that depend on each other form an
+        algebraic loop. Loops are reported, and with resolve_loops each loop is stepped
+        repeatedly until the values it writes converge.
+
+        Args:
+            resolve_loops (bool): Solve algebraic loops by fixed-point iteration.
+            max_iterations (int): Iteration limit per loop and step.
+            tolerance (float): Relative change below which a loop counts as converged.
+
+        Returns:
+            list: Component names of each algebraic loop.
+        """
+        from PythonSim.dataflow import LoopGroup, dataflow_order
+        ordered, loops = dataflow_order(self.components)
+        self.components = ordered
+        self.algebraic_loops = [[comp.name for comp in loop] for loop in loops]
+        for names in self.algebraic_loops:
+            print(f"Algebraic loop between [{'], ['.join(names)}]")
+        self.loop_groups = [LoopGroup(loop, max_iterations, tolerance) for loop in loops] if resolve_loops else []
+        if self.compiled_step is not None:
+            self.compile()
+        return self.algebraic_loops
+
+    def loop_step(self, dt: float):
+        # Components outside loops step once, each loop steps as one unit at its first member's position
+        for unit in self.execution_plan:
+            unit.step(dt)
+            unit.update_signal_ports()
+        self.step_count += 1
+
+    def get_step_functions(self) -> tuple[callable, callable]:
+        if self.loop_groups:
+            if self.is_multi_rate():
+                raise ValueError("Algebraic loop resolution does not support multi-rate components.")
+            first_of = {id(group.components[0]): group for group in self.loop_groups}
+            in_loop = {id(comp) for group in self.loop_groups for comp in group.components}
+            self.execution_plan = [first_of.get(id(comp), comp) for comp in self.components
+                                   if id(comp) in first_of or id(comp) not in in_loop]
+        # Profiling swaps in timed versions, so the normal path pays nothing for it
+        if self.profiler is not None:
+            from PythonSim.profiling import profiled_log_step, profiled_step
+            return partial(profiled_step, self), partial(profiled_log_step, self)
+        if self.loop_groups:
+            return self.loop_step, self.log_step
+        return self.compiled_step or self.step, self.log_step
+
+    def get_port_state(self) -> np.ndarray:
+        # Zero-copy view of every port value, only available with a bus attached
+        if self.bus is None:
+            raise RuntimeError("System has no port bus. Call attach_bus() first.")
+        return self.bus.values
+
+    @property
+    def logs(self) -> dict[str, np.ndarray]:
+        # Zero-copy column views of the filled part of the log buffer
+        filled = self.log_buffer[:self.log_index]
+        return {name: filled[:, col] for col, name in enumerate(self.log_names)}
+
+    @property
+    def log_array(self) -> np.ndarray:
+        return self.log_buffer[:self.log_index]
+
+    def initialize_logging(self, n_rows: int = 0, out: np.ndarray | None = None):
+        self.log_names = ["time"]
+        self.log_getters = []
         for comp in self.components:
             for name, getter in comp.get_logged_variables().items():
+                self.log_names.append(name)
+                self.log_getters.append(getter)
+        shape = (n_rows, len(self.log_names))
+        if out is None:
+            self.log_buffer = np.full(shape, np.nan)
+        else:
+            # Log straight into a caller-owned buffer, e.g. a slice of a shared-memory array
+            if out.shape != shape:
+                raise ValueError(f"Log buffer must have shape {shape}, got {out.shape}.")
+            out.fill(np.nan)
+            self.log_buffer = out
+        self.log_index = 0
+
+    def grow_logging(self, n_rows: int):
+        extra = np.full((max(n_rows, 1), len(self.log_names)), np.nan)
+        self.log_buffer = np.concatenate((self.log_buffer, extra))
+
+    def log_capacity(self) -> int:
+        return len(self.log_buffer)
+
+    def log_step(self, t: float):
+        if self.log_index >= self.log_capacity():
+            self.grow_logging(self.log_capacity())
+        row = self.log_index
+        try:
+            self.log_buffer[row] = [t] + [getter() for getter in self.log_getters]
+        except Exception:
+            # Fall back to one value at a time so a single failing getter only costs its own column
+            self.log_buffer[row, 0] = t
+            for col, getter in enumerate(self.log_getters, start=1):
                 try:
-                    self.logs[name].append(getter())
-                except:
-                    self.logs[name].append(None)
+                    self.log_buffer[row, col] = getter()
+                except Exception:
+                    self.log_buffer[row, col] = np.nan
+        self.log_index += 1
 
     def step(self, dt: float):
+        if not self.is_multi_rate():
+            for comp in self.components:
+                comp.step(dt)
+                comp.update_signal_ports()
+        else:
+            for comp, divisor in self.get_rate_schedule(self.step_count):
+                comp.step(dt * divisor)
+                comp.update_signal_ports()
+        self.step_count += 1
+
+    def get_rate_schedule(self, step_count: int) -> list[tuple[Component, int]]:
+        # The components due at a step only depend on which divisors divide it, so cache per divisor set
+        due = tuple(d for d in self.distinct_divisors if step_count % d == 0)
+        schedule = self.rate_schedules.get(due)
+        if schedule is None:
+            schedule = [(comp, d) for comp, d in zip(self.components, self.rate_divisors) if d in due]
+            self.rate_schedules[due] = schedule
+        return schedule
+
+    def get_state_vector(self) -> np.ndarray:
+        return np.array([getattr(comp, name) for comp in self.components for name in comp.states], dtype=float)
+
+    def set_state_vector(self, x):
+        idx = 0
         for comp in self.components:
-            comp.step(dt)
-            comp.update_signal_ports()
-
-    def simulate(self, t_end: float, dt: float):
-        self.initialize_logging()
-        t = 0.0
-        while t <= t_end:
-            self.step(dt)
-            self.log_step(t)
-            t += dt
+            for name in comp.states:
+                setattr(comp, name, x[idx])
+                idx += 1
+
+    def simulate_continuous(self, t_end: float, dt: float, method: str = "RK45",
+                            rtol: float = 1e-6, atol: float = 1e-9, log_every: int = 1):
+        from PythonSim.solver import simulate_continuous
+        return simulate_continuous(self, t_end, dt, method=method, rtol=rtol, atol=atol, log_every=log_every)
+
+    @staticmethod
+    def count_steps(t_end: float, dt: float) -> int:
+        # Same number of steps as stepping t by dt while t <= t_end, without the float drift
+        return math.floor(t_end / dt + 1e-9) + 1
+
+    def checkpoint(self, path: str | None = None, include_logs: bool = False) -> bytes:
+        from PythonSim.checkpoint import capture, dumps
+        data = dumps(capture(self, include_logs=include_logs))
+        if path is not None:
+            # Write then rename, so a crash mid-write never leaves a truncated checkpoint
+            with open(path + ".tmp", "wb") as f:
+                f.write(data)
+            os.replace(path + ".tmp", path)
+        return data
+
+    def restore(self, checkpoint: bytes | str, keep=()) -> dict:
+        # keep: "component.attribute" names, e.g. changed parameters, that keep their current value
+        from PythonSim.checkpoint import apply, loads
+        if isinstance(checkpoint, str):
+            with open(checkpoint, "rb") as f:
+                checkpoint = f.read()
+        state = loads(checkpoint)
+        apply(self, state, keep=keep)
+        return state
+
+    def preload_logs(self, rows: np.ndarray):
+        self.log_buffer[:len(rows)] = rows
+        self.log_index = len(rows)
+
+    def simulate(self, t_end: float, dt: float, log_every: int = 1, out: np.ndarray | None = None,
+                 start: bytes | str | None = None, resume: bool = False,
+                 checkpoint_every: int | None = None, checkpoint_path: str | None = None,
+                 checkpoint_logs: bool = False, keep=()):
+        """
+        Steps the system from its start (or a checkpoint) to t_end and logs every log_every steps.
+
+        Args:
+            t_end (float): End time of the simulation.
+            dt (float): Time step.
+            log_every (int): Log only every Nth step.
+            out (np.ndarray): Optional preallocated (rows, vars) buffer to log into.
+            start (bytes | str): Checkpoint, or path to one, to restore and continue from.
+                Every saved attribute is restored, parameters included, except those in keep.
+            resume (bool): Continue from the current system time, e.g. after restore() and
+                changing some parameters, instead of starting at t = 0.
+            checkpoint_every (int): Write a checkpoint to checkpoint_path every N steps.
+            checkpoint_path (str): Path of the periodic checkpoint file.
+            checkpoint_logs (bool): Include the logs so far in periodic checkpoints, so
+                resuming after a crash keeps the logged history. Each checkpoint then
+                rewrites the whole log, so the total cost grows quadratically with the run
+                length. Without, only the state is recovered.
+            keep (list[str]): "component.attribute" names restored from start keeps at
+                their current value, e.g. ["motor.k"] to branch a variant off a shared
+                warm state.
+
+        Returns:
+            dict: The system logs.
+        """
+        if log_every < 1:
+            raise ValueError("log_every must be a positive integer.")
+        if checkpoint_every is not None and checkpoint_path is None:
+            raise ValueError("checkpoint_every needs a checkpoint_path.")
+        n_steps = self.count_steps(t_end, dt)
+
+        saved = self.restore(start, keep=keep) if start is not None else None
+        start_step = round(self.time / dt) if (saved is not None or resume) else 0
+        prior_logs = saved["logs"] if saved is not None and saved["logs"] is not None else None
+        if prior_logs is not None and saved["log_names"] != self.log_names_of_components():
+            raise ValueError("Checkpoint logs do not match the logged variables of the system.")
+
+        # Rows are the second to last axis, EnsembleSystem logs are (variants, rows, vars)
+        n_prior = 0 if prior_logs is None else prior_logs.shape[-2]
+        n_rows = n_prior + max(0, -(-n_steps // log_every) - (-(-start_step // log_every)))
+        self.initialize_logging(n_rows=n_rows, out=out)
+        if prior_logs is not None:
+            self.preload_logs(prior_logs)
+        self.schedule_rates(dt)
+        self.step_count = start_step
+
+        step, log_step = self.get_step_functions()
+        for i in range(start_step, n_steps):
+            step(dt)
+            if i % log_every == 0:
+                log_step(i * dt)
+            if checkpoint_every and (i + 1) % checkpoint_every == 0:
+                self.time = (i + 1) * dt
+                self.checkpoint(checkpoint_path, include_logs=checkpoint_logs)
+        self.time = max(n_steps, start_step) * dt
         print("Simulation complete.")
         return self.logs
+
+    def log_names_of_components(self) -> list[str]:
+        return ["time"] + [name for comp in self.components for name in comp.get_logged_variables()]
+
+    def simulate_stream(self, t_end: float, dt: float, chunk_size: int = 10_000, log_every: int = 1, sinks=()):
+        """
+        Runs simulate() as a generator that keeps at most chunk_size log rows in memory.
+
+        Each full chunk is written to every sink and then yielded as a (rows, vars) view
+        of the log buffer. The view is overwritten by the next chunk, so copy it to keep it.
+
+        Args:
+            t_end (float): End time of the simulation.
+            dt (float): Time step.
+            chunk_size (int): Number of log rows per chunk.
+            log_every (int): Log only every Nth step.
+            sinks (list[LogSink]): Sinks from PythonSim.sinks that receive every chunk.
+
+        Yields:
+            np.ndarray: The log rows of one chunk, with columns in the order of log_names.
+        """
+        if log_every < 1 or chunk_size < 1:
+            raise ValueError("log_every and chunk_size must be positive integers.")
+        n_steps = self.count_steps(t_end, dt)
+        n_rows = -(-n_steps // log_every)
+        self.initialize_logging(n_rows=min(chunk_size, n_rows))
+        self.schedule_rates(dt)
+        for sink in sinks:
+            sink.open(self.log_names, n_rows)
+
+        step, log_step = self.get_step_functions()
+        try:
+            for i in range(n_steps):
+                step(dt)
+                if i % log_every == 0:
+                    log_step(i * dt)
+                    if self.log_index == self.log_capacity():
+                        yield self.flush_chunk(sinks)
+            if self.log_index:
+                yield self.flush_chunk(sinks)
+            self.time = n_steps * dt
+        finally:
+            for sink in sinks:
+                sink.close()
+        print("Simulation complete.")
+
+    def flush_chunk(self, sinks=()) -> np.ndarray:
+        chunk = self.log_array
+        for sink in sinks:
+            sink.write(chunk)
+        self.log_index = 0
+        return chunk
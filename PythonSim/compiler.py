@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+from functools import partial
+
+from PythonSim.bus import BusPowerPort, BusSignalPort, bind_bus_fast_paths
+from PythonSim.classes import Component, PowerPort, SignalPort
+
+# Port methods that get replaced by direct attribute access on compiled ports
+FAST_PATH_METHODS = ("read_effort", "read_flow", "write_effort", "write_flow", "read_signal", "write_signal")
+
+
+def bind_port_fast_paths(port):
+    # Bus ports index the bus array directly
+    if isinstance(port, (BusPowerPort, BusSignalPort)):
+        bind_bus_fast_paths(port)
+
+    # Otherwise reads go straight to the connected port's attribute, writes straight to our own
+    elif isinstance(port, PowerPort):
+        port.write_effort = partial(setattr, port, "effort")
+        port.write_flow = partial(setattr, port, "flow")
+        if port.connected is not None:
+            port.read_effort = partial(getattr, port.connected, "effort")
+            port.read_flow = partial(getattr, port.connected, "flow")
+    elif isinstance(port, SignalPort):
+        port.write_signal = partial(setattr, port, "signal")
+        if port.connected is not None:
+            port.read_signal = partial(getattr, port.connected, "signal")
+
+
+def unbind_port_fast_paths(port):
+    for method in FAST_PATH_METHODS:
+        port.__dict__.pop(method, None)
+    # Bus ports keep indexing the bus for as long as it is attached
+    if isinstance(port, (BusPowerPort, BusSignalPort)):
+        bind_bus_fast_paths(port)
+
+
+def generate_step_source(system) -> tuple[str, dict]:
+    namespace = {"system": system}
+    lines = ["def fused_step(dt):", "    k = system.step_count"]
+
+    for c_idx, comp in enumerate(system.components):
+        # Components with a sample period or rate group only step when their divisor is due
+        indent = "    "
+        step_dt = "dt"
+        if system.get_sample_period(comp) is not None:
+            divisor_name = f"c{c_idx}_div"
+            namespace[divisor_name] = 1
+            lines.append(f"    if k % {divisor_name} == 0:")
+            indent = "        "
+            step_dt = f"dt * {divisor_name}"
+
+        step_name = f"c{c_idx}_step"
+        namespace[step_name] = comp.step
+        lines.append(f"{indent}{step_name}({step_dt})  # {comp.name}")
+
+        # Components with their own update_signal_ports are called as-is
+        if type(comp).update_signal_ports is not Component.update_signal_ports:
+            update_name = f"c{c_idx}_update"
+            namespace[update_name] = comp.update_signal_ports
+            lines.append(f"{indent}{update_name}()")
+            continue
+
+        for s_idx, (name, port) in enumerate(comp.signal_ports.items()):
+            # Nobody can read a signal port that is not connected, so skip its getter
+            if port.connected is None:
+                continue
+            write_name, getter_name = f"c{c_idx}_sig{s_idx}", f"c{c_idx}_var{s_idx}"
+            namespace[write_name] = port.write_signal
+            namespace[getter_name] = comp.variables[name]
+            lines.append(f"{indent}{write_name}({getter_name}())")
+
+    lines.append("    system.step_count = k + 1")
+    return "\n".join(lines) + "\n", namespace
+
+
+def compile_system(system) -> callable:
+    for comp in system.components:
+        for port in comp.get_ports():
+            unbind_port_fast_paths(port)
+            bind_port_fast_paths(port)
+
+    source, namespace = generate_step_source(system)
+    exec(compile(source, "<PythonSim fused step>", "exec"), namespace)
+    fused_step = namespace["fused_step"]
+    fused_step.source = source
+
+    def set_divisors(divisors: list[int]):
+        for c_idx, divisor in enumerate(divisors):
+            if f"c{c_idx}_div" in namespace:
+                namespace[f"c{c_idx}_div"] = divisor
+
+    fused_step.set_divisors = set_divisors
+    if system.rate_divisors:
+        set_divisors(system.rate_divisors)
+    return fused_step
+
+
+def decompile_system(system):
+    for comp in system.components:
+        for port in comp.get_ports():
+            unbind_port_fast_paths(port)
@@ -0,0 +1,245 @@
+from __future__ import annotations
+
+import ast
+import copy
+import inspect
+import textwrap
+
+import numpy as np
+
+from PythonSim.checkpoint import STRUCTURAL_ATTRIBUTES
+from PythonSim.classes import Component, Port, PowerPort, SignalPort
+
+READ_METHODS = {"read_effort": "effort", "read_flow": "flow", "read_signal": "signal"}
+WRITE_METHODS = {"write_effort": "effort", "write_flow": "flow", "write_signal": "signal"}
+
+
+def port_fields(port) -> tuple[str, ...]:
+    if isinstance(port, PowerPort):
+        return ("effort", "flow")
+    if isinstance(port, SignalPort):
+        return ("signal",)
+    return ()
+
+
+def resolve_port(node, comp):
+    # Resolves self.<attr>[.<attr>...] to a port object, None for anything more dynamic
+    attrs = []
+    while isinstance(node, ast.Attribute):
+        attrs.append(node.attr)
+        node = node.value
+    if not (isinstance(node, ast.Name) and node.id == "self") or not attrs:
+        return None
+    obj = comp
+    for attr in reversed(attrs):
+        obj = getattr(obj, attr, None)
+    return obj if isinstance(obj, (PowerPort, SignalPort)) else None
+
+
+def port_accesses(comp: Component) -> tuple[set, set]:
+    """
+    Finds which port values a component reads and writes while stepping.
+
+    The component's class source is scanned for read_*/write_* calls on self.<port>
+    in every method except __init__. Calls that cannot be resolved, or classes without
+    source, are treated as touching every port of that kind.
+
+    Returns:
+        tuple: Sets of (port, field) pairs that are read and written.
+    """
+    ports = comp.get_ports()
+    reads, writes = set(), set()
+
+    # Automatic signal ports are written by update_signal_ports
+    for port in comp.signal_ports.values():
+        writes.add((port, "signal"))
+
+    try:
+        tree = ast.parse(textwrap.dedent(inspect.getsource(type(comp))))
+    except (OSError, TypeError, SyntaxError):
+        tree = None
+
+    if tree is None:
+        for port in ports:
+            for field in port_fields(port):
+                reads.add((port, field))
+                writes.add((port, field))
+        return reads, writes
+
+    for func in ast.walk(tree):
+        if not isinstance(func, (ast.FunctionDef, ast.AsyncFunctionDef)) or func.name == "__init__":
+            continue
+        for node in ast.walk(func):
+            if not (isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute)):
+                continue
+            method = node.func.attr
+            if method not in READ_METHODS and method not in WRITE_METHODS:
+                continue
+            field = READ_METHODS.get(method) or WRITE_METHODS[method]
+            target = reads if method in READ_METHODS else writes
+            port = resolve_port(node.func.value, comp)
+            if port is not None:
+                target.add((port, field))
+            else:
+                target.update((p, field) for p in ports if field in port_fields(p))
+    return reads, writes
+
+
+def build_dependencies(components: list[Component]) -> dict[int, set[int]]:
+    # Edge producer -> consumer when the consumer reads a value the producer writes
+    writers = {}
+    accesses = [port_accesses(comp) for comp in components]
+    for idx, (_, writes) in enumerate(accesses):
+        for port, field in writes:
+            writers.setdefault((id(port), field), set()).add(idx)
+
+    edges = {idx: set() for idx in range(len(components))}
+    for idx, (reads, _) in enumerate(accesses):
+        for port, field in reads:
+            if port.connected is None:
+                continue
+            for producer in writers.get((id(port.connected), field), ()):
+                if producer != idx:
+                    edges[producer].add(idx)
+    return edges
+
+
+def strongly_connected_components(edges: dict[int, set[int]]) -> list[list[int]]:
+    # Tarjan's algorithm, iterative so large systems do not hit the recursion limit
+    index, low, on_stack, stack, groups = {}, {}, set(), [], []
+    counter = 0
+    for root in sorted(edges):
+        if root in index:
+            continue
+        work = [(root, iter(sorted(edges[root])))]
+        index[root] = low[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack.add(root)
+        while work:
+            node, children = work[-1]
+            child = next(children, None)
+            if child is not None:
+                if child not in index:
+                    index[child] = low[child] = counter
+                    counter += 1
+                    stack.append(child)
+                    on_stack.add(child)
+                    work.append((child, iter(sorted(edges[child]))))
+                elif child in on_stack:
+                    low[node] = min(low[node], index[child])
+                continue
+            work.pop()
+            if work:
+                parent = work[-1][0]
+                low[parent] = min(low[parent], low[node])
+            if low[node] == index[node]:
+                group = []
+                while True:
+                    member = stack.pop()
+                    on_stack.discard(member)
+                    group.append(member)
+                    if member == node:
+                        break
+                groups.append(sorted(group))
+    return groups
+
+
+def dataflow_order(components: list[Component]) -> tuple[list[Component], list[list[Component]]]:
+    """
+    Orders components so producers run before the consumers that read their ports.
+
+    Returns:
+        tuple: The ordered components, and the groups of components that form
+        algebraic loops. Loop members keep their original relative order.
+    """
+    edges = build_dependencies(components)
+    groups = strongly_connected_components(edges)
+    group_of = {member: g_idx for g_idx, group in enumerate(groups) for member in group}
+
+    # Topological sort of the loop-condensed graph, ties broken by original position
+    group_edges = {g_idx: set() for g_idx in range(len(groups))}
+    in_degree = {g_idx: 0 for g_idx in range(len(groups))}
+    for producer, consumers in edges.items():
+        for consumer in consumers:
+            a, b = group_of[producer], group_of[consumer]
+            if a != b and b not in group_edges[a]:
+                group_edges[a].add(b)
+                in_degree[b] += 1
+
+    ready = sorted((groups[g][0], g) for g, degree in in_degree.items() if degree == 0)
+    ordered, loops = [], []
+    while ready:
+        _, g_idx = ready.pop(0)
+        ordered += [components[member] for member in groups[g_idx]]
+        if len(groups[g_idx]) > 1:
+            loops.append([components[member] for member in groups[g_idx]])
+        for nxt in group_edges[g_idx]:
+            in_degree[nxt] -= 1
+            if in_degree[nxt] == 0:
+                ready.append((groups[nxt][0], nxt))
+                ready.sort()
+    return ordered, loops
+
+
+class LoopGroup:
+    """
+    Steps the components of an algebraic loop repeatedly until the port values they
+    write stop changing. Component attributes are restored before every repeat, so
+    state is only advanced once per step.
+    """
+
+    def __init__(self, components: list[Component], max_iterations: int = 20, tolerance: float = 1e-9):
+        self.components = components
+        self.max_iterations = max_iterations
+        self.tolerance = tolerance
+        self.name = "loop(" + ", ".join(comp.name for comp in components) + ")"
+        self.outputs = sorted(
+            {(port, field) for comp in components for port, field in port_accesses(comp)[1]},
+            key=lambda item: (item[0].name, item[1]),
+        )
+        self.iterations = 0
+        self.steps = 0
+        self.unconverged = 0
+
+    def values(self) -> list:
+        # Copies of arrays (e.g. EnsembleSystem ports), which the next iteration may change in place
+        return [value.copy() if isinstance(value, np.ndarray) else value
+                for value in (getattr(port, field) for port, field in self.outputs)]
+
+    @staticmethod
+    def save_state(comp: Component) -> dict:
+        # Deep copies, so state changed in place (self.x += ...) is restored as well
+        return {
+            attr: copy.deepcopy(value) for attr, value in vars(comp).items()
+            if attr not in STRUCTURAL_ATTRIBUTES and not isinstance(value, Port) and not callable(value)
+        }
+
+    def converged(self, current: list, previous: list) -> bool:
+        return all(
+            np.all(np.abs(np.subtract(a, b)) <= self.tolerance * (1.0 + np.abs(b)))
+            for a, b in zip(current, previous)
+        )
+
+    def step(self, dt: float):
+        saved = [self.save_state(comp) for comp in self.components]
+        previous = self.values()
+        for iteration in range(1, self.max_iterations + 1):
+            if iteration > 1:
+                for comp, attributes in zip(self.components, saved):
+                    for attr, value in attributes.items():
+                        setattr(comp, attr, copy.deepcopy(value))
+            for comp in self.components:
+                comp.step(dt)
+                comp.update_signal_ports()
+            current = self.values()
+            if self.converged(current, previous):
+                break
+            previous = current
+        else:
+            self.unconverged += 1
+        self.iterations += iteration
+        self.steps += 1
+
+    def update_signal_ports(self):
+        pass
@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import numpy as np
+
+from PythonSim.classes import Component, PowerPort, SignalPort, System
+
+
+class EnsembleSystem(System):
+    """
+    Runs N parameter variants of the same system in lockstep.
+
+    Port values and varied parameters are NumPy arrays of length N, so one step()
+    advances every variant, as long as the components' arithmetic broadcasts.
+    Logs are stored as an (N, steps, vars) array.
+    """
+
+    def __init__(self, n_variants: int):
+        super().__init__()
+        if n_variants < 1:
+            raise ValueError("n_variants must be a positive integer.")
+        self.n_variants = n_variants
+        self.log_buffer = np.empty((n_variants, 0, 1))
+
+    def vary(self, comp: Component, parameter: str, values):
+        values = np.asarray(values, dtype=float)
+        if values.shape != (self.n_variants,):
+            raise ValueError(f"[{comp.name}] {parameter} needs {self.n_variants} values, got shape {values.shape}.")
+        if not hasattr(comp, parameter):
+            raise AttributeError(f"[{comp.name}] has no parameter {parameter}.")
+        setattr(comp, parameter, values)
+
+    def initialize_ports(self):
+        # Start every port as a vector so variants never share a scalar
+        for comp in self.components:
+            for port in comp.get_ports():
+                if isinstance(port, PowerPort):
+                    port.effort = np.full(self.n_variants, port.effort, dtype=float)
+                    port.flow = np.full(self.n_variants, port.flow, dtype=float)
+                elif isinstance(port, SignalPort):
+                    port.signal = np.full(self.n_variants, port.signal, dtype=float)
+
+    def attach_bus(self):
+        raise NotImplementedError("EnsembleSystem port values are arrays and cannot live on a scalar PortBus.")
+
+    @property
+    def logs(self) -> dict[str, np.ndarray]:
+        filled = self.log_buffer[:, :self.log_index]
+        return {name: filled[:, :, col] for col, name in enumerate(self.log_names)}
+
+    @property
+    def log_array(self) -> np.ndarray:
+        return self.log_buffer[:, :self.log_index]
+
+    def initialize_logging(self, n_rows: int = 0, out: np.ndarray | None = None):
+        super().initialize_logging(n_rows=0)
+        shape = (self.n_variants, n_rows, len(self.log_names))
+        if out is None:
+            self.log_buffer = np.full(shape, np.nan)
+        else:
+            if out.shape != shape:
+                raise ValueError(f"Log buffer must have shape {shape}, got {out.shape}.")
+            out.fill(np.nan)
+            self.log_buffer = out
+
+    def log_capacity(self) -> int:
+        return self.log_buffer.shape[1]
+
+    def grow_logging(self, n_rows: int):
+        extra = np.full((self.n_variants, max(n_rows, 1), len(self.log_names)), np.nan)
+        self.log_buffer = np.concatenate((self.log_buffer, extra), axis=1)
+
+    def log_step(self, t: float):
+        if self.log_index >= self.log_capacity():
+            self.grow_logging(self.log_capacity())
+        row = self.log_buffer[:, self.log_index]
+        row[:, 0] = t
+        for col, getter in enumerate(self.log_getters, start=1):
+            try:
+                row[:, col] = getter()
+            except Exception:
+                row[:, col] = np.nan
+        self.log_index += 1
+
+    def preload_logs(self, rows: np.ndarray):
+        self.log_buffer[:, :rows.shape[1]] = rows
+        self.log_index = rows.shape[1]
+
+    def simulate(self, t_end: float, dt: float, log_every: int = 1, out: np.ndarray | None = None, **kwargs):
+        self.initialize_ports()
+        return super().simulate(t_end, dt, log_every=log_every, out=out, **kwargs)
+
+    def simulate_stream(self, t_end: float, dt: float, chunk_size: int = 10_000, log_every: int = 1, sinks=()):
+        # Chunks are (N, rows, vars) views, so only sinks that accept 3-D blocks can be used
+        self.initialize_ports()
+        yield from super().simulate_stream(t_end, dt, chunk_size=chunk_size, log_every=log_every, sinks=sinks)
@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import json
+import os
+from time import perf_counter
+
+from PythonSim.classes import System
+
+
+class Profiler:
+    """
+    Aggregates call counts and wall time per (name, category) while a System runs profiled.
+
+    Every call is counted, but only the first trace_limit calls are kept as individual
+    events for the Chrome trace, so long runs do not grow without bound.
+    """
+
+    def __init__(self, trace_limit: int = 100_000):
+        self.trace_limit = trace_limit
+        self.stats: dict[tuple[str, str], list] = {}
+        self.events: list[tuple[str, str, float, float]] = []
+        self.origin = perf_counter()
+
+    def record(self, name: str, category: str, start: float, end: float):
+        entry = self.stats.get((name, category))
+        if entry is None:
+            entry = self.stats[(name, category)] = [0, 0.0]
+        entry[0] += 1
+        entry[1] += end - start
+        if len(self.events) < self.trace_limit:
+            self.events.append((name, category, start, end))
+
+    def report(self) -> list[dict]:
+        # Getter times are also part of the enclosing log_step time
+        total = sum(entry[1] for entry in self.stats.values()) or 1.0
+        rows = [
+            {
+                "name": name,
+                "category": category,
+                "calls": calls,
+                "total_s": elapsed,
+                "per_call_us": elapsed / calls * 1e6,
+                "share": elapsed / total,
+            }
+            for (name, category), (calls, elapsed) in self.stats.items()
+        ]
+        return sorted(rows, key=lambda row: row["total_s"], reverse=True)
+
+    def to_json(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.report(), f, indent=4)
+
+    def to_chrome_trace(self, path: str):
+        # Complete ("X") events in microseconds, viewable in chrome://tracing or Perfetto
+        pid = os.getpid()
+        trace = [
+            {
+                "name": name,
+                "cat": category,
+                "ph": "X",
+                "ts": (start - self.origin) * 1e6,
+                "dur": (end - start) * 1e6,
+                "pid": pid,
+                "tid": 0,
+            }
+            for name, category, start, end in self.events
+        ]
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": trace, "displayTimeUnit": "ms"}, f)
+
+
+def profiled_step(system, dt: float):
+    # Same schedule as System.step (or loop_step), timing each component's step and signal port update
+    profiler = system.profiler
+    if system.loop_groups:
+        # A resolved algebraic loop is timed as one unit, its iterations included
+        schedule = [(unit, 1) for unit in system.execution_plan]
+    elif system.is_multi_rate():
+        schedule = system.get_rate_schedule(system.step_count)
+    else:
+        schedule = [(comp, 1) for comp in system.components]
+    for comp, divisor in schedule:
+        t0 = perf_counter()
+        comp.step(dt * divisor)
+        t1 = perf_counter()
+        comp.update_signal_ports()
+        t2 = perf_counter()
+        profiler.record(comp.name, "step", t0, t1)
+        profiler.record(comp.name, "update_signal_ports", t1, t2)
+    system.step_count += 1
+
+
+def profiled_log_step(system, t: float):
+    # Times every getter on its own so a slow add_variable lambda shows up by name
+    profiler = system.profiler
+    t0 = perf_counter()
+    if type(system).log_step is not System.log_step:
+        # Systems with their own log layout (e.g. EnsembleSystem) are timed as a whole
+        system.log_step(t)
+        profiler.record("log_step", "logging", t0, perf_counter())
+        return
+    if system.log_index >= system.log_capacity():
+        system.grow_logging(system.log_capacity())
+    row = system.log_buffer[system.log_index]
+    row[0] = t
+    for col, getter in enumerate(system.log_getters, start=1):
+        g0 = perf_counter()
+        try:
+            row[col] = getter()
+        except Exception:
+            row[col] = float("nan")
+        profiler.record(system.log_names[col], "getter", g0, perf_counter())
+    system.log_index += 1
+    profiler.record("log_step", "logging", t0, perf_counter())
@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+import csv
+import json
+import os
+
+import numpy as np
+
+
+class LogSink:
+    """Receives fixed-size (rows, vars) blocks of log samples from System.simulate_stream."""
+
+    def open(self, names: list[str], n_rows: int):
+        raise NotImplementedError("Each sink must implement the open method.")
+
+    def write(self, block: np.ndarray):
+        raise NotImplementedError("Each sink must implement the write method.")
+
+    def close(self):
+        pass
+
+
+class MemorySink(LogSink):
+    def __init__(self):
+        self.names: list[str] = []
+        self.blocks: list[np.ndarray] = []
+
+    def open(self, names: list[str], n_rows: int):
+        self.names = list(names)
+        self.blocks = []
+
+    def write(self, block: np.ndarray):
+        self.blocks.append(block.copy())
+
+    def result(self) -> dict[str, np.ndarray]:
+        data = np.concatenate(self.blocks) if self.blocks else np.empty((0, len(self.names)))
+        return {name: data[:, col] for col, name in enumerate(self.names)}
+
+
+class NpySink(LogSink):
+    """Writes into a memory-mapped .npy file with one float64 field per logged variable."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.array: np.memmap | None = None
+        self.rows_written = 0
+
+    def open(self, names: list[str], n_rows: int):
+        self.dtype = np.dtype([(name, np.float64) for name in names])
+        self.array = np.lib.format.open_memmap(self.path, mode="w+", dtype=self.dtype, shape=(n_rows,))
+        self.rows_written = 0
+
+    def write(self, block: np.ndarray):
+        if block.ndim != 2:
+            raise ValueError(f"[{self.path}] Expected a 2-D block, got shape {block.shape}.")
+        records = np.ascontiguousarray(block).view(self.dtype)[:, 0]
+        self.array[self.rows_written:self.rows_written + len(records)] = records
+        self.rows_written += len(records)
+        self.array.flush()
+
+    def close(self):
+        if self.array is not None:
+            self.array.flush()
+            self.array = None
+
+
+class BinarySink(LogSink):
+    """Appends raw float64 rows to a .bin file, with the column names in a .json sidecar."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.file = None
+
+    def open(self, names: list[str], n_rows: int):
+        with open(self.path + ".json", "w", encoding="utf-8") as f:
+            json.dump({"names": list(names), "dtype": "float64"}, f)
+        self.file = open(self.path, "wb")
+
+    def write(self, block: np.ndarray):
+        if block.ndim != 2:
+            raise ValueError(f"[{self.path}] Expected a 2-D block, got shape {block.shape}.")
+        self.file.write(np.ascontiguousarray(block, dtype=np.float64).tobytes())
+        self.file.flush()
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+class CsvSink(LogSink):
+    def __init__(self, path: str):
+        self.path = path
+        self.file = None
+
+    def open(self, names: list[str], n_rows: int):
+        self.file = open(self.path, "w", encoding="utf-8", newline="")
+        csv.writer(self.file).writerow(names)
+
+    def write(self, block: np.ndarray):
+        if block.ndim != 2:
+            raise ValueError(f"[{self.path}] Expected a 2-D block, got shape {block.shape}.")
+        np.savetxt(self.file, block, delimiter=",", fmt="%.17g")
+        self.file.flush()
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+def read_log(path: str) -> dict[str, np.ndarray]:
+    """
+    Opens a log written by NpySink or BinarySink without loading it into memory.
+
+    Args:
+        path (str): Path of the .npy or .bin log file.
+
+    Returns:
+        dict: Memory-mapped column views, keyed by variable name.
+    """
+    if path.endswith(".npy"):
+        records = np.load(path, mmap_mode="r")
+        return {name: records[name] for name in records.dtype.names}
+
+    with open(path + ".json", "r", encoding="utf-8") as f:
+        names = json.load(f)["names"]
+    if os.path.getsize(path) == 0:
+        data = np.empty((0, len(names)))
+    else:
+        data = np.memmap(path, dtype=np.float64, mode="r").reshape(-1, len(names))
+    return {name: data[:, col] for col, name in enumerate(names)}
+
+
+def iter_csv_log(path: str, chunk_rows: int = 10_000):
+    """
+    Reads a log written by CsvSink in chunks of rows.
+
+    Args:
+        path (str): Path of the .csv log file.
+        chunk_rows (int): Number of rows per yielded chunk.
+
+    Yields:
+        dict: Column arrays of one chunk, keyed by variable name.
+    """
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        reader = csv.reader(f)
+        names = next(reader)
+        rows = []
+        for row in reader:
+            rows.append([float(value) for value in row])
+            if len(rows) == chunk_rows:
+                data = np.array(rows)
+                yield {name: data[:, col] for col, name in enumerate(names)}
+                rows = []
+        if rows:
+            data = np.array(rows)
+            yield {name: data[:, col] for col, name in enumerate(names)}
@@ -0,0 +1,181 @@
+from __future__ import annotations
+
+import contextlib
+import io
+import itertools
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# Run status codes kept in shared memory next to the results
+PENDING, DONE, FAILED, CANCELLED = 0, 1, -1, 2
+
+
+def expand_grid(param_grid) -> list[dict]:
+    # A dict of value lists is expanded to its cartesian product, a list of dicts is used as-is
+    if isinstance(param_grid, dict):
+        names = list(param_grid)
+        return [dict(zip(names, values)) for values in itertools.product(*param_grid.values())]
+    return [dict(params) for params in param_grid]
+
+
+def run_chunk(system_factory, jobs, t_end, dt, log_every, data_name, status_name, shape, quiet):
+    data_shm = shared_memory.SharedMemory(name=data_name)
+    status_shm = shared_memory.SharedMemory(name=status_name)
+    try:
+        data = np.ndarray(shape, dtype=np.float64, buffer=data_shm.buf)
+        # The last status entry is the cancel flag
+        status = np.ndarray((shape[0] + 1,), dtype=np.int8, buffer=status_shm.buf)
+        errors = {}
+        for run_idx, params in jobs:
+            if status[-1]:
+                status[run_idx] = CANCELLED
+                continue
+            try:
+                with contextlib.redirect_stdout(io.StringIO()) if quiet else contextlib.nullcontext():
+                    system = system_factory(**params)
+                    system.simulate(t_end, dt, log_every=log_every, out=data[run_idx])
+                status[run_idx] = DONE
+            except Exception as e:
+                status[run_idx] = FAILED
+                errors[run_idx] = f"{type(e).__name__}: {e}"
+        del data, status
+        return errors
+    finally:
+        data_shm.close()
+        status_shm.close()
+
+
+class SweepResult:
+    """
+    Logs of every run of a Sweep, held in shared memory until close() is called.
+
+    data has shape (runs, rows, vars) with columns in the order of names, and NaN rows
+    for runs that failed or were cancelled.
+    """
+
+    def __init__(self, params: list[dict], names: list[str], data_shm, status_shm, shape, errors):
+        self.params = params
+        self.names = names
+        self.errors: dict[int, str] = errors
+        self._data_shm = data_shm
+        self._status_shm = status_shm
+        self.data = np.ndarray(shape, dtype=np.float64, buffer=data_shm.buf)
+        self.status = np.ndarray((shape[0],), dtype=np.int8, buffer=status_shm.buf)
+
+    def logs(self, run_idx: int) -> dict[str, np.ndarray]:
+        return {name: self.data[run_idx, :, col] for col, name in enumerate(self.names)}
+
+    def close(self):
+        if self._data_shm is not None:
+            del self.data, self.status
+            for shm in (self._data_shm, self._status_shm):
+                shm.close()
+                shm.unlink()
+            self._data_shm = self._status_shm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class Sweep:
+    """
+    Runs System.simulate for every point of a parameter grid on a process pool.
+
+    The system factory is called as system_factory(**params) in the worker processes,
+    so it must be picklable, e.g. a module-level function. Each run logs straight into
+    its slice of a shared-memory result array.
+    """
+
+    def __init__(self, system_factory, param_grid, t_end: float, dt: float, log_every: int = 1):
+        self.system_factory = system_factory
+        self.params = expand_grid(param_grid)
+        self.t_end = t_end
+        self.dt = dt
+        self.log_every = log_every
+        self._status: np.ndarray | None = None
+        self._futures = []
+
+    def log_shape(self) -> tuple[list[str], tuple[int, int, int]]:
+        # Build one system in the parent to learn the logged variables
+        with contextlib.redirect_stdout(io.StringIO()):
+            probe = self.system_factory(**self.params[0])
+        probe.initialize_logging()
+        n_steps = probe.count_steps(self.t_end, self.dt)
+        n_rows = -(-n_steps // self.log_every)
+        return probe.log_names, (len(self.params), n_rows, len(probe.log_names))
+
+    def run(self, max_workers: int | None = None, chunk_size: int | None = None,
+            progress=None, quiet: bool = True) -> SweepResult:
+        """
+        Runs the sweep and blocks until every run has finished or been cancelled.
+
+        Args:
+            max_workers (int): Number of worker processes, defaults to the CPU count.
+            chunk_size (int): Runs per task sent to a worker, defaults to about 4 tasks per worker.
+            progress (callable): Called as progress(done_runs, total_runs) as chunks complete.
+            quiet (bool): Silence the prints of the systems in the workers.
+
+        Returns:
+            SweepResult: The shared-memory results. Call close() to free them.
+        """
+        if not self.params:
+            raise ValueError("Parameter grid is empty.")
+        names, shape = self.log_shape()
+        max_workers = max_workers or os.cpu_count() or 1
+        chunk_size = chunk_size or max(1, -(-len(self.params) // (max_workers * 4)))
+
+        data_shm = shared_memory.SharedMemory(create=True, size=max(1, int(np.prod(shape)) * 8))
+        status_shm = shared_memory.SharedMemory(create=True, size=shape[0] + 1)
+        status = np.ndarray((shape[0] + 1,), dtype=np.int8, buffer=status_shm.buf)
+        status[:] = PENDING
+        self._status = status
+
+        jobs = list(enumerate(self.params))
+        chunks = [jobs[i:i + chunk_size] for i in range(0, len(jobs), chunk_size)]
+        errors = {}
+        done_runs = 0
+        try:
+            with ProcessPoolExecutor(max_workers=max_workers) as pool:
+                self._futures = {
+                    pool.submit(run_chunk, self.system_factory, chunk, self.t_end, self.dt, self.log_every,
+                                data_shm.name, status_shm.name, shape, quiet): len(chunk)
+                    for chunk in chunks
+                }
+                pending = set(self._futures)
+                while pending:
+                    finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        done_runs += self._futures[future]
+                        if not future.cancelled():
+                            errors.update(future.result())
+                    if progress is not None:
+                        progress(done_runs, len(jobs))
+        except BaseException:
+            self._status = None
+            del status
+            data_shm.close()
+            data_shm.unlink()
+            status_shm.close()
+            status_shm.unlink()
+            raise
+        finally:
+            self._futures = []
+            self._status = None
+
+        # Chunks cancelled before they started never marked their runs
+        status[:-1][status[:-1] == PENDING] = CANCELLED
+        del status
+        return SweepResult(self.params, names, data_shm, status_shm, shape, errors)
+
+    def cancel(self):
+        # Stops queued chunks and makes running workers skip their remaining runs
+        if self._status is not None:
+            self._status[-1] = 1
+        for future in list(self._futures):
+            future.cancel()
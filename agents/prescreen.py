@@ -0,0 +1,99 @@
+import ast
+
+
+def base_name(node) -> str:
+    # Component, classes.Component and PythonSim.classes.Component all resolve to Component
+    if isinstance(node, ast.Name):
+        return node.id
+    if isinstance(node, ast.Attribute):
+        return node.attr
+    return ""
+
+
+def find_component_classes(tree: ast.Module) -> dict:
+    classes = {node.name: node for node in tree.body if isinstance(node, ast.ClassDef)}
+    components = {}
+    changed = True
+    # Subclasses of subclasses defined in the same file count too
+    while changed:
+        changed = False
+        for name, node in classes.items():
+            if name in components:
+                continue
+            if any(base_name(base) == "Component" or base_name(base) in components for base in node.bases):
+                components[name] = node
+                changed = True
+    return components
+
+
+def find_method(cls: ast.ClassDef, name: str, components: dict):
+    # Looks up a method along the in-file Component base chain
+    for node in cls.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and node.name == name:
+            return node
+    for base in cls.bases:
+        parent = components.get(base_name(base))
+        if parent is not None and parent is not cls:
+            method = find_method(parent, name, components)
+            if method is not None:
+                return method
+    return None
+
+
+def check_constructor(cls: ast.ClassDef, init) -> list[str]:
+    issues = []
+    args = init.args
+    positional = args.posonlyargs + args.args
+    if len(positional) < 2 and args.vararg is None:
+        issues.append(f"Line {init.lineno}: Constructor of {cls.name} must take a name argument after self.")
+        return issues
+
+    # Same rule as val_tests.has_safe_constructor: everything after self and name needs a default
+    n_without_default = len(positional) - len(args.defaults)
+    for idx, arg in enumerate(positional[2:], start=2):
+        if idx < n_without_default:
+            issues.append(f"Line {arg.lineno}: Constructor argument '{arg.arg}' of {cls.name} has no default value.")
+    for arg, default in zip(args.kwonlyargs, args.kw_defaults):
+        if default is None:
+            issues.append(f"Line {arg.lineno}: Constructor argument '{arg.arg}' of {cls.name} has no default value.")
+    return issues
+
+
+def prescreen_code(code_str: str) -> list[str]:
+    """
+    Checks the structure of generated component code without running it.
+
+    Checks the rules of the engineer template that val_tests.py would otherwise only
+    find out in a subprocess: the code parses, defines a Component subclass with a
+    step method, and every constructor argument after name has a default.
+
+    Args:
+        code_str (str): The code, already cleaned of markdown fencing.
+
+    Returns:
+        list: Line-numbered issues, empty if the code may go on to dynamic testing.
+    """
+    try:
+        tree = ast.parse(code_str)
+    except SyntaxError as e:
+        return [f"Line {e.lineno}: Syntax error: {e.msg}."]
+
+    components = find_component_classes(tree)
+    if not components:
+        return ["No class subclassing Component found. The model must be defined as class Name(Component)."]
+
+    # val_tests.py picks the first Component subclass by name, so check that one
+    cls = components[sorted(components)[0]]
+    issues = []
+
+    step = find_method(cls, "step", components)
+    if step is None:
+        issues.append(f"Line {cls.lineno}: {cls.name} has no step(self, dt) method.")
+    elif len(step.args.posonlyargs + step.args.args) < 2 and step.args.vararg is None:
+        issues.append(f"Line {step.lineno}: {cls.name}.step must take the time step dt as an argument.")
+
+    init = find_method(cls, "__init__", components)
+    if init is not None:
+        issues += check_constructor(cls, init)
+
+    return issues
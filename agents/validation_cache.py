@@ -0,0 +1,99 @@
+import ast
+import glob
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def normalize_code(code_str: str) -> str:
+    """
+    Normalizes code so formatting and comment changes map to the same cache key.
+
+    Code that parses is reduced to its AST dump, which drops comments, blank lines and
+    spacing. Code with syntax errors keeps its lines (the error refers to them), with
+    trailing whitespace and line endings normalized.
+    """
+    try:
+        return ast.dump(ast.parse(code_str))
+    except (SyntaxError, ValueError):
+        return "\n".join(line.rstrip() for line in code_str.replace("\r\n", "\n").split("\n")).strip()
+
+
+def validation_version(script_path: str) -> str:
+    # A verdict is only valid for the validation script, PythonSim and the VAL_* budgets it was produced with
+    digest = hashlib.sha256()
+    paths = [script_path] + sorted(glob.glob(os.path.join(REPO_ROOT, "PythonSim", "*.py")))
+    for path in paths:
+        with open(path, "rb") as f:
+            digest.update(f.read())
+    for name, value in sorted(os.environ.items()):
+        if name.startswith("VAL_"):
+            digest.update(f"\0{name}={value}".encode("utf-8"))
+    return digest.hexdigest()
+
+
+class ValidationCache:
+    """
+    Persistent, size-bounded LRU cache of validation verdicts in SQLite.
+
+    Entries are keyed by a hash of the normalized code and the validation version and
+    hold the status and issues list returned by val_tests.py.
+    """
+
+    def __init__(self, path: str, script_path: str, max_entries: int = 10_000):
+        self.path = path
+        self.max_entries = max_entries
+        self.version = validation_version(script_path)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        # WAL with normal sync keeps the last_used update on every hit cheap
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        with self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS verdicts ("
+                "key TEXT PRIMARY KEY, status TEXT, issues TEXT, last_used REAL)"
+            )
+            self.connection.execute("CREATE INDEX IF NOT EXISTS verdicts_lru ON verdicts (last_used)")
+
+    def key(self, code_str: str) -> str:
+        return hashlib.sha256(f"{self.version}\0{normalize_code(code_str)}".encode("utf-8")).hexdigest()
+
+    def get(self, key: str):
+        with self.lock:
+            row = self.connection.execute("SELECT status, issues FROM verdicts WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            with self.connection:
+                self.connection.execute("UPDATE verdicts SET last_used = ? WHERE key = ?", (time.time(), key))
+            self.hits += 1
+            return {"status": row[0], "issues": json.loads(row[1])}
+
+    def put(self, key: str, result: dict):
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO verdicts (key, status, issues, last_used) VALUES (?, ?, ?, ?)",
+                (key, result.get("status", "fail"), json.dumps(result.get("issues", [])), time.time()),
+            )
+            # Evict the least recently used entries beyond the size bound
+            self.connection.execute(
+                "DELETE FROM verdicts WHERE key IN ("
+                "SELECT key FROM verdicts ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def clear(self):
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM verdicts")
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
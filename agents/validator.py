@@ -1,11 +1,20 @@
+import atexit
 import os
+import queue
+import select
 import subprocess
 import tempfile
+import threading
 import json
 import sys
+import time
 
 from langchain_core.messages import AIMessage
 
+from agents.prescreen import prescreen_code
+from agents.validation_cache import ValidationCache
+from tracing import record_wait
+
 def clean_code_fencing(code: str) -> str:
     lines = code.strip().splitlines()
 
@@ -17,40 +26,169 @@ def clean_code_fencing(code: str) -> str:
 
     return "\n".join(lines).strip()
 
+class ValidatorWorker:
+    """A long-lived val_tests.py --worker process that validates code sent over a pipe."""
+
+    def __init__(self, script_path: str, timeout: float = 10, memory_mb: int = 1024):
+        self.script_path = script_path
+        self.timeout = timeout
+        self.memory_mb = memory_mb
+        self.process = None
+
+    def start(self):
+        self.process = subprocess.Popen(
+            [sys.executable, self.script_path, "--worker", str(self.timeout), str(self.memory_mb)],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            encoding="utf-8",
+            bufsize=1,
+        )
+
+    def stop(self):
+        if self.process is not None:
+            self.process.kill()
+            self.process.wait()
+            self.process = None
+
+    def restart(self):
+        self.stop()
+        self.start()
+
+    def run(self, code_str: str) -> dict:
+        if self.process is None or self.process.poll() is not None:
+            self.restart()
+        try:
+            self.process.stdin.write(json.dumps({"code": code_str}) + "\n")
+            self.process.stdin.flush()
+            # The worker enforces the job timeout itself, this only catches a hung worker
+            ready, _, _ = select.select([self.process.stdout], [], [], self.timeout + 5)
+            line = self.process.stdout.readline() if ready else ""
+        except (BrokenPipeError, OSError):
+            line = ""
+        if not line:
+            self.restart()
+            return {"status": "fail", "issues": ["Validation worker crashed or hung, it was restarted."], "transient": True}
+        return json.loads(line)
+
+
+class ValidatorPool:
+    """Pre-warmed validator workers, started lazily and shared between threads."""
+
+    def __init__(self, script_path: str, size: int = 2, timeout: float = 10, memory_mb: int = 1024):
+        self.workers = [ValidatorWorker(script_path, timeout, memory_mb) for _ in range(size)]
+        self.idle = queue.Queue()
+        for worker in self.workers:
+            self.idle.put(worker)
+        self.lock = threading.Lock()
+        self.started = False
+
+    def start(self):
+        with self.lock:
+            if not self.started:
+                for worker in self.workers:
+                    worker.start()
+                self.started = True
+
+    def run(self, code_str: str) -> dict:
+        self.start()
+        t0 = time.perf_counter()
+        worker = self.idle.get()
+        record_wait(time.perf_counter() - t0)
+        try:
+            return worker.run(code_str)
+        finally:
+            self.idle.put(worker)
+
+    def close(self):
+        for worker in self.workers:
+            worker.stop()
+        self.started = False
+
+
 class ComponentValidator:
-    def __init__(self, script_path: str):
+    def __init__(self, script_path: str, pool_size: int = 2, timeout: float = 10,
+                 cache_path: str | None = "validation_cache.sqlite", cache_size: int = 10_000):
         self.script_path = script_path  # Path to validation script
+        self.timeout = timeout
+
+        # Forked, resource-limited jobs need POSIX; elsewhere every validation spawns a fresh process
+        self.pool = ValidatorPool(script_path, size=pool_size, timeout=timeout) \
+            if pool_size > 0 and hasattr(os, "fork") else None
+
+        # Verdicts of previously seen code, None disables caching
+        self.cache = ValidationCache(cache_path, script_path, max_entries=cache_size) if cache_path else None
 
     def validate(self, text_str: str) -> str:
         code_str = clean_code_fencing(text_str)
+
+        # Structural problems are found in-process, without paying for a validation run
+        issues = prescreen_code(code_str)
+        if issues:
+            return self.format_result({"status": "fail", "issues": issues})
+
+        if self.cache is None:
+            return self.format_result(self.run_validation(code_str))
+
+        key = self.cache.key(code_str)
+        result = self.cache.get(key)
+        if result is None:
+            result = self.run_validation(code_str)
+            # Timeouts, crashes and missed performance budgets may not happen again, so only real verdicts are cached
+            if not result.get("transient") and not result.get("performance_only"):
+                self.cache.put(key, result)
+        return self.format_result(result)
+
+    def run_validation(self, code_str: str) -> dict:
+        if self.pool is not None:
+            return self.pool.run(code_str)
+
         with tempfile.TemporaryDirectory() as temp_dir:
             code_path = os.path.join(temp_dir, "generated_component.py")
             with open(code_path, "w", encoding="utf-8") as f:
                 f.write(code_str)
 
-            result = subprocess.run(
-                [sys.executable, self.script_path, code_path],
-                capture_output=True,
-                text=True,
-                timeout=10
-            )
+            try:
+                result = subprocess.run(
+                    [sys.executable, self.script_path, code_path],
+                    capture_output=True,
+                    text=True,
+                    timeout=self.timeout
+                )
+            except subprocess.TimeoutExpired:
+                return {"status": "fail", "issues": [f"Validation timed out after {self.timeout} s."], "transient": True}
 
             if result.returncode != 0:
-                return f"Fail: Validation script failed: {result.stderr.strip()}"
+                return {"status": "fail", "issues": [f"Validation script failed: {result.stderr.strip()}"], "transient": True}
 
             try:
-                output = json.loads(result.stdout)
-                status = output.get("status", "fail")
-                issues = output.get("issues", [])
-                if status.lower() == "pass":
-                    return "PASS"
-                else:
-                    return f"FAIL: " + "\n".join(issues)
+                return json.loads(result.stdout)
             except json.JSONDecodeError as e:
-                return f"FAIL: Invalid JSON output: {e}\nRaw output:\n{result.stdout.strip()}"
+                return {"status": "fail", "issues": [f"Invalid JSON output: {e}\nRaw output:\n{result.stdout.strip()}"],
+                        "transient": True}
+
+    @staticmethod
+    def format_result(output: dict) -> str:
+        status = output.get("status", "fail")
+        issues = output.get("issues", [])
+        if status.lower() == "pass":
+            return "PASS"
+        else:
+            return f"FAIL: " + "\n".join(issues)
 
     def invoke(self, text_str: str):
         return AIMessage(content=self.validate(text_str))
 
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
+        if self.cache is not None:
+            self.cache.close()
+
+
+# val_tests.py lives in the repository root, next to the agents package
+VAL_TESTS_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "val_tests.py")
 
-validator = ComponentValidator(script_path=r"C:\Users\Fishyman\PycharmProjects\ThesisWork\val_tests.py")
+validator = ComponentValidator(script_path=VAL_TESTS_PATH)
+atexit.register(validator.close)
@@ -0,0 +1,206 @@
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langgraph.prebuilt import create_react_agent
+
+# The agents build their chat models on import, no request ever reaches the API here
+os.environ.setdefault("OPENAI_API_KEY", "offline-benchmark")
+
+import multi_agent_system
+from agents import architect, engineer, scientist
+from agents.validator import ComponentValidator, VAL_TESTS_PATH
+from cost_ledger import DEFAULT_MODEL, cost_ledger
+from tracing import tracer, trace_run, percentile
+
+ARCHITECT_REPLY = """Component: Gearbox
+Approach: Ideal fixed-ratio gearbox with constant efficiency.
+Ports: shaft_in (rotational PowerPort), shaft_out (rotational PowerPort).
+Parameters: ratio (-), eta (-)."""
+
+GOOD_CODE = '''```python
+from PythonSim.classes import PowerPort, SignalPort, Component
+
+class Gearbox(Component):
+    def __init__(self, name: str,
+                 ratio: float = 5.0,  # Input speed / output speed, -
+                 eta: float = 0.97,  # Efficiency, -
+                 ):
+        super().__init__(name)
+        self.ratio = ratio
+        self.eta = eta
+        self.T_out = 0.0
+
+        self.shaft_in = PowerPort(name + "_in")
+        self.shaft_out = PowerPort(name + "_out")
+        self.add_port(self.shaft_in)
+        self.add_port(self.shaft_out)
+        self.add_variable("T_out", lambda: self.T_out)
+
+    def step(self, dt):
+        T_in = self.shaft_in.read_effort()
+        w_out = self.shaft_out.read_flow()
+        self.T_out = T_in * self.ratio * self.eta
+        self.shaft_out.write_effort(self.T_out)
+        self.shaft_in.write_flow(w_out * self.ratio)
+```'''
+
+# Passes the static prescreen and fails when stepped (division by zero), so its validation
+# runs in the worker pool like the good code's and validator latency measures real runs
+BAD_CODE = GOOD_CODE.replace("self.T_out = T_in * self.ratio * self.eta",
+                             "self.T_out = T_in * self.ratio * self.eta / (w_out - w_out)")
+
+
+class ScriptedChatModel(BaseChatModel):
+    """
+    Offline stand-in for the agents' chat model. Replies depend only on the agent (its
+    system prompt) and the conversation, so any number of runs can share one model:
+    the engineer first writes code the validator rejects when fail_first is set and
+    fixes it after the critique, the scientist always accepts.
+
+    Every reply sleeps latency_s and carries token usage, so the graph, cost
+    accounting and tracing do the same work as with a real model.
+    """
+
+    latency_s: float = 0.0
+    fail_first: bool = True
+    calls: int = 0
+    model_s: float = 0.0
+    lock: object = None
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.lock = threading.Lock()
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    def bind_tools(self, tools, **kwargs):
+        # The scripted replies never call tools
+        return self
+
+    def reply(self, messages) -> str:
+        system = messages[0].content if messages and messages[0].type == "system" else ""
+        if system == architect.system_prompt:
+            return ARCHITECT_REPLY
+        if system == scientist.system_prompt:
+            return "The equations are dimensionally consistent and physically sound.\n\nPASS"
+        if system == engineer.system_prompt:
+            critiqued = any(message.content.startswith("FAIL") for message in messages[1:])
+            return GOOD_CODE if critiqued or not self.fail_first else BAD_CODE
+        raise ValueError("ScriptedChatModel got a prompt of an unknown agent.")
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        t0 = time.perf_counter()
+        content = self.reply(messages)
+        if self.latency_s:
+            time.sleep(self.latency_s)
+        input_tokens = sum(len(str(message.content)) for message in messages) // 4
+        output_tokens = len(content) // 4
+        message = AIMessage(
+            content=content,
+            response_metadata={"model_name": DEFAULT_MODEL, "token_usage": {
+                "prompt_tokens": input_tokens, "completion_tokens": output_tokens,
+                "total_tokens": input_tokens + output_tokens}},
+            usage_metadata={"input_tokens": input_tokens, "output_tokens": output_tokens,
+                            "total_tokens": input_tokens + output_tokens},
+        )
+        with self.lock:
+            self.calls += 1
+            self.model_s += time.perf_counter() - t0
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+def install_scripted_agents(model: ScriptedChatModel):
+    # Same prompts and tools as the real agents, only the chat model is replaced
+    multi_agent_system.architect = create_react_agent(model, tools=[architect.get_io_variables],
+                                                      prompt=architect.system_prompt)
+    multi_agent_system.engineer = create_react_agent(model, tools=[], prompt=engineer.system_prompt)
+    multi_agent_system.scientist = create_react_agent(model, tools=[], prompt=scientist.system_prompt)
+
+
+def run_task(task: str, run_label: str) -> bool:
+    state = multi_agent_system.new_team_state()
+    with trace_run(run_label):
+        multi_agent_system.run_mas_on_state(state, task)
+    return state["validated"]
+
+
+def run_mas_benchmark(n_tasks: int = 20, workers: int = 1, latency_s: float = 0.0, fail_first: bool = True,
+                      validator_cache: bool = False, validator_pool_size: int = 2, verbose: bool = True) -> dict:
+    """
+    Runs n_tasks tasks through the MAS graph against a ScriptedChatModel and the real
+    validator, on workers threads.
+
+    Graph overhead is the run time not spent in agent or validator spans, agent
+    overhead is the agent span time not spent in the model, i.e. ReAct agent, context
+    compaction and cost accounting.
+
+    Args:
+        latency_s (float): Simulated model latency per call.
+        fail_first (bool): Whether the engineer's first code fails validation, which
+            adds one engineer and one validator round per task.
+        validator_cache (bool): Reuse verdicts; without, every validation runs the tests.
+
+    Returns:
+        dict: Throughput, overheads and validator latency.
+    """
+    model = ScriptedChatModel(latency_s=latency_s, fail_first=fail_first)
+    install_scripted_agents(model)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        cache_path = os.path.join(temp_dir, "validation_cache.sqlite") if validator_cache else None
+        validator = ComponentValidator(VAL_TESTS_PATH, pool_size=validator_pool_size, cache_path=cache_path)
+        multi_agent_system.validator = validator
+        # The ledger still prices every scripted call, but writes nothing next to real costs
+        cost_ledger.ledger_path = os.path.join(temp_dir, "costs.jsonl")
+        cost_ledger.summary_path = None
+        try:
+            # Starts the validator workers and loads the graph outside the measurement
+            run_task("warm-up", "warm-up")
+            tracer.clear()
+            model.calls, model.model_s = 0, 0.0
+
+            t0 = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                validated = list(pool.map(run_task, ["Model a gearbox."] * n_tasks,
+                                          [f"task-{idx}" for idx in range(n_tasks)]))
+            wall_s = time.perf_counter() - t0
+            cost_ledger.flush()
+        finally:
+            validator.close()
+
+    spans = list(tracer.spans)
+    runs = [s for s in spans if s["category"] == "graph"]
+    agent_s = sum(s["wall_s"] for s in spans if s["category"] == "agent")
+    validations = [s["wall_s"] for s in spans if s["category"] == "validator"]
+    run_s = sum(s["wall_s"] for s in runs)
+    result = {
+        "tasks": n_tasks,
+        "workers": workers,
+        "latency_s": latency_s,
+        "fail_first": fail_first,
+        "validator_cache": validator_cache,
+        "validated": sum(validated),
+        "wall_s": wall_s,
+        "tasks_per_min": 60 * n_tasks / wall_s,
+        "model_calls": model.calls,
+        "run_p50_s": percentile([s["wall_s"] for s in runs], 50),
+        "run_p95_s": percentile([s["wall_s"] for s in runs], 95),
+        "graph_overhead_s": (run_s - agent_s - sum(validations)) / n_tasks,
+        "agent_overhead_s": (agent_s - model.model_s) / n_tasks,
+        "validations": len(validations),
+        "validator_p50_s": percentile(validations, 50),
+        "validator_p95_s": percentile(validations, 95),
+    }
+    if verbose:
+        print(f"  {n_tasks} tasks on {workers} workers, {latency_s * 1000:.0f} ms model latency: "
+              f"{result['tasks_per_min']:.1f} tasks/min, graph overhead {result['graph_overhead_s'] * 1000:.1f} ms/task, "
+              f"agent overhead {result['agent_overhead_s'] * 1000:.1f} ms/task, "
+              f"validator p50 {result['validator_p50_s'] * 1000:.1f} ms, p95 {result['validator_p95_s'] * 1000:.1f} ms")
+    return result
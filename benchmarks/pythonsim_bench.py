@@ -0,0 +1,68 @@
+import contextlib
+import io
+import time
+
+from benchmarks.reference_models import build_reference_system
+
+# How each system is prepared before simulating
+MODES = ("plain", "compiled", "bus", "compiled_bus")
+
+
+def prepare(n_drivetrains: int, mode: str):
+    if mode not in MODES:
+        raise ValueError(f"Unknown simulation mode '{mode}'. Available modes: {list(MODES)}")
+    system = build_reference_system(n_drivetrains)
+    if mode in ("bus", "compiled_bus"):
+        system.attach_bus()
+    if mode in ("compiled", "compiled_bus"):
+        system.compile()
+    return system
+
+
+def bench_system(n_drivetrains: int, mode: str, t_end: float = 2.0, dt: float = 1e-4,
+                 log_every: int = 10, repeats: int = 3) -> dict:
+    """
+    Simulates a fresh reference system repeats times and reports the best run, since
+    slower runs only add noise from the rest of the machine.
+
+    Returns:
+        dict: Size, mode, steps and the best wall time and steps per second.
+    """
+    times = []
+    final_speed = None
+    for _ in range(repeats):
+        # Connecting ports and finishing a simulation print, which would dominate small systems
+        with contextlib.redirect_stdout(io.StringIO()):
+            system = prepare(n_drivetrains, mode)
+            t0 = time.perf_counter()
+            logs = system.simulate(t_end, dt, log_every=log_every)
+            times.append(time.perf_counter() - t0)
+        final_speed = float(logs["d0_vehicle_v"][-1])
+    n_steps = system.count_steps(t_end, dt)
+    best = min(times)
+    return {
+        "drivetrains": n_drivetrains,
+        "components": 4 * n_drivetrains,
+        "mode": mode,
+        "steps": n_steps,
+        "wall_s": best,
+        "steps_per_s": n_steps / best,
+        "component_steps_per_s": 4 * n_drivetrains * n_steps / best,
+        # Same physics in every mode, a differing value means a mode changed the results
+        "final_speed": final_speed,
+    }
+
+
+def run_pythonsim_benchmarks(sizes=(1, 10, 100), modes=MODES, t_end: float = 2.0, dt: float = 1e-4,
+                             log_every: int = 10, repeats: int = 3, verbose: bool = True) -> list[dict]:
+    results = []
+    for n_drivetrains in sizes:
+        # Larger systems get proportionally shorter runs, so every size takes about as long
+        size_t_end = max(dt * 100, t_end / n_drivetrains)
+        for mode in modes:
+            row = bench_system(n_drivetrains, mode, size_t_end, dt, log_every, repeats)
+            results.append(row)
+            if verbose:
+                print(f"  {row['components']:>4} components  {mode:<13} {row['steps_per_s']:>10.0f} steps/s  "
+                      f"{row['component_steps_per_s']:>11.0f} component steps/s")
+    return results
@@ -0,0 +1,142 @@
+import math
+
+from PythonSim.classes import PowerPort, Component, System
+
+
+class TheveninBattery(Component):
+    def __init__(self, name: str,
+                 v_oc: float = 48.0,  # Open-circuit voltage at full charge, V
+                 r_int: float = 0.02,  # Internal resistance, Ohm
+                 capacity: float = 3600.0 * 100.0,  # Charge capacity, C
+                 soc: float = 1.0,  # Initial state of charge
+                 ):
+        super().__init__(name)
+        self.v_oc = v_oc
+        self.r_int = r_int
+        self.capacity = capacity
+        self.soc = soc
+        self.i = 0.0
+        self.v = v_oc
+
+        self.elec = PowerPort(name + "_elec")
+        self.add_port(self.elec)
+        self.add_variable("soc", lambda: self.soc)
+        self.add_variable("v", lambda: self.v)
+
+    def step(self, dt):
+        self.i = self.elec.read_flow()
+        self.soc -= self.i * dt / self.capacity
+        # Open-circuit voltage drops linearly to 80 % over the charge range
+        self.v = self.v_oc * (0.8 + 0.2 * self.soc) - self.r_int * self.i
+        self.elec.write_effort(self.v)
+
+
+class DCMotor(Component):
+    def __init__(self, name: str,
+                 R: float = 0.2,  # Armature resistance, Ohm
+                 L: float = 1e-3,  # Armature inductance, H
+                 k: float = 0.5,  # Torque and back-EMF constant, N m/A
+                 ):
+        super().__init__(name)
+        self.R = R
+        self.L = L
+        self.k = k
+        self.i = 0.0
+        self.T = 0.0
+
+        self.elec = PowerPort(name + "_elec")
+        self.rot = PowerPort(name + "_rot")
+        self.add_port(self.elec)
+        self.add_port(self.rot)
+        self.add_variable("i", lambda: self.i)
+        self.add_variable("T", lambda: self.T)
+
+    def step(self, dt):
+        v = self.elec.read_effort()
+        w = self.rot.read_flow()
+        self.i += (v - self.R * self.i - self.k * w) / self.L * dt
+        self.T = self.k * self.i
+        self.elec.write_flow(self.i)
+        self.rot.write_effort(self.T)
+
+
+class Gearbox(Component):
+    def __init__(self, name: str,
+                 ratio: float = 8.0,  # Input speed / output speed
+                 efficiency: float = 0.97,
+                 ):
+        super().__init__(name)
+        self.ratio = ratio
+        self.efficiency = efficiency
+        self.T_out = 0.0
+
+        self.shaft_in = PowerPort(name + "_in")
+        self.shaft_out = PowerPort(name + "_out")
+        self.add_port(self.shaft_in)
+        self.add_port(self.shaft_out)
+        self.add_variable("T_out", lambda: self.T_out)
+
+    def step(self, dt):
+        T_in = self.shaft_in.read_effort()
+        w_out = self.shaft_out.read_flow()
+        self.T_out = T_in * self.ratio * self.efficiency
+        self.shaft_out.write_effort(self.T_out)
+        self.shaft_in.write_flow(w_out * self.ratio)
+
+
+class VehicleLongitudinal(Component):
+    def __init__(self, name: str,
+                 m: float = 1500.0,  # Vehicle mass, kg
+                 r_w: float = 0.3,  # Wheel radius, m
+                 c_d: float = 0.3,  # Drag coefficient
+                 A: float = 2.2,  # Frontal area, m^2
+                 c_rr: float = 0.01,  # Rolling resistance coefficient
+                 rho: float = 1.2,  # Air density, kg/m^3
+                 ):
+        super().__init__(name)
+        self.m = m
+        self.r_w = r_w
+        self.c_d = c_d
+        self.A = A
+        self.c_rr = c_rr
+        self.rho = rho
+        self.v = 0.0
+        self.x = 0.0
+
+        self.wheel = PowerPort(name + "_wheel")
+        self.add_port(self.wheel)
+        self.add_variable("v", lambda: self.v)
+        self.add_variable("x", lambda: self.x)
+
+    def step(self, dt):
+        T = self.wheel.read_effort()
+        F_resist = 0.5 * self.rho * self.c_d * self.A * self.v * abs(self.v) \
+            + self.c_rr * self.m * 9.81 * math.tanh(self.v * 10.0)
+        self.v += (T / self.r_w - F_resist) / self.m * dt
+        self.x += self.v * dt
+        self.wheel.write_flow(self.v / self.r_w)
+
+
+def build_drivetrain(system: System, prefix: str = ""):
+    # Battery -> DC motor -> gearbox -> vehicle, each connection is two-way
+    battery = TheveninBattery(prefix + "battery")
+    motor = DCMotor(prefix + "motor")
+    gearbox = Gearbox(prefix + "gearbox")
+    vehicle = VehicleLongitudinal(prefix + "vehicle")
+    for comp in (battery, motor, gearbox, vehicle):
+        system.add_component(comp)
+    system.connect(battery.elec, motor.elec)
+    system.connect(motor.rot, gearbox.shaft_in)
+    system.connect(gearbox.shaft_out, vehicle.wheel)
+    return vehicle
+
+
+def build_reference_system(n_drivetrains: int = 1) -> System:
+    """
+    Builds a System of n independent battery, DC motor, gearbox and vehicle drivetrains,
+    4 * n components in total.
+    """
+    system = System()
+    for idx in range(n_drivetrains):
+        build_drivetrain(system, prefix=f"d{idx}_")
+    return system
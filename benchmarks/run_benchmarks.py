@@ -0,0 +1,100 @@
+"""
+Offline benchmarks of the MAS pipeline and PythonSim, run from the repository root:
+
+    python -m benchmarks.run_benchmarks --out bench.json
+    python -m benchmarks.run_benchmarks --compare old.json bench.json
+
+No API key or network is needed. Results are written as JSON together with the commit
+they were measured on, so runs of different commits can be compared.
+"""
+import argparse
+import datetime
+import json
+import platform
+import subprocess
+import sys
+
+
+def git_commit() -> str | None:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True)
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], capture_output=True, text=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return commit.stdout.strip() + ("-dirty" if dirty.stdout.strip() else "")
+
+
+def metrics_of(results: dict) -> dict:
+    # Flat {name: value} of the numbers worth comparing between runs
+    metrics = {}
+    for row in results.get("pythonsim", []):
+        metrics[f"pythonsim/{row['components']}/{row['mode']}/steps_per_s"] = row["steps_per_s"]
+    for row in results.get("mas", []):
+        prefix = f"mas/{row['workers']}w/{row['latency_s'] * 1000:.0f}ms"
+        for key in ("tasks_per_min", "graph_overhead_s", "agent_overhead_s", "validator_p50_s", "validator_p95_s"):
+            metrics[f"{prefix}/{key}"] = row[key]
+    return metrics
+
+
+def compare(old_path: str, new_path: str):
+    with open(old_path, "r", encoding="utf-8") as f:
+        old = json.load(f)
+    with open(new_path, "r", encoding="utf-8") as f:
+        new = json.load(f)
+    old_metrics, new_metrics = metrics_of(old), metrics_of(new)
+    print(f"{old.get('commit')} -> {new.get('commit')}")
+    for name in sorted(old_metrics.keys() & new_metrics.keys()):
+        before, after = old_metrics[name], new_metrics[name]
+        change = f"{(after - before) / before * 100:+.1f} %" if before else "n/a"
+        print(f"  {name:<55} {before:>12.4g} {after:>12.4g}  {change}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline MAS and PythonSim benchmarks.")
+    parser.add_argument("--out", default="benchmark_results.json", help="JSON file the results are written to.")
+    parser.add_argument("--only", choices=("mas", "pythonsim"), help="Run only one of the suites.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 10, 100],
+                        help="Reference system sizes, in drivetrains of 4 components each.")
+    parser.add_argument("--t-end", type=float, default=2.0, help="Simulated time of the smallest system, s.")
+    parser.add_argument("--repeats", type=int, default=3, help="Simulations per size and mode, the best counts.")
+    parser.add_argument("--tasks", type=int, default=20, help="MAS tasks per configuration.")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4], help="Concurrent MAS runs.")
+    parser.add_argument("--latency", type=float, nargs="+", default=[0.0, 0.05],
+                        help="Scripted model latencies per call, s.")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"),
+                        help="Compare two result files instead of running.")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    results = {
+        "commit": git_commit(),
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+    }
+
+    if args.only in (None, "pythonsim"):
+        from benchmarks.pythonsim_bench import run_pythonsim_benchmarks
+        print("PythonSim:")
+        results["pythonsim"] = run_pythonsim_benchmarks(sizes=args.sizes, t_end=args.t_end, repeats=args.repeats)
+
+    if args.only in (None, "mas"):
+        # Imported here, so the PythonSim suite runs without the LangChain stack installed
+        from benchmarks.mas_bench import run_mas_benchmark
+        print("MAS:")
+        results["mas"] = [
+            run_mas_benchmark(n_tasks=args.tasks, workers=workers, latency_s=latency)
+            for latency in args.latency
+            for workers in args.workers
+        ]
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results saved to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+from langchain_core.messages import HumanMessage
+
+# Agents whose messages state the problem (the user's request and the architect's problem statement)
+PROBLEM_ROLES = ("architect",)
+
+# Agents whose messages critique the latest code
+CRITIC_ROLES = ("validator", "scientist")
+
+
+def role_of(message) -> str:
+    if isinstance(message, HumanMessage):
+        return "user"
+    return getattr(message, "name", None) or ""
+
+
+def problem_statement(chat: list) -> list:
+    # The user's messages and the latest problem statement
+    users = [message for message in chat if role_of(message) == "user"]
+    problems = [message for message in chat if role_of(message) in PROBLEM_ROLES]
+    return users + problems[-1:]
+
+
+def latest_code(chat: list) -> list:
+    for message in reversed(chat):
+        if role_of(message) == "engineer":
+            return [message]
+    return []
+
+
+def critiques_of_latest_code(chat: list) -> list:
+    critiques = []
+    for message in reversed(chat):
+        role = role_of(message)
+        if role == "engineer":
+            break
+        if role in CRITIC_ROLES:
+            critiques.append(message)
+    return critiques[::-1]
+
+
+def full_policy(chat: list) -> list:
+    return list(chat)
+
+
+def code_policy(chat: list) -> list:
+    return problem_statement(chat) + latest_code(chat)
+
+
+def code_and_critiques_policy(chat: list) -> list:
+    return problem_statement(chat) + latest_code(chat) + critiques_of_latest_code(chat)
+
+
+POLICIES = {
+    "full": full_policy,
+    "code": code_policy,
+    "code_and_critiques": code_and_critiques_policy,
+}
+
+# Policy used per agent, agents not listed see the full chat
+agent_policies = {
+    "architect": "full",
+    "engineer": "code_and_critiques",
+    "scientist": "code",
+}
+
+
+def configure_context(**policies):
+    """
+    Sets the context compaction policy per agent, e.g. configure_context(engineer="full").
+
+    Policies:
+        full: The whole chat.
+        code: The problem statement and the latest code.
+        code_and_critiques: The problem statement, the latest code and the validator and
+            scientist critiques of it.
+    """
+    for agent_name, policy in policies.items():
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown context policy '{policy}'. Available policies: {list(POLICIES)}")
+        agent_policies[agent_name] = policy
+
+
+def compact_chat(chat: list, agent_name: str) -> list:
+    # Messages keep their chat order, so the conversation still reads top to bottom
+    selected = {id(message) for message in POLICIES[agent_policies.get(agent_name, "full")](chat)}
+    return [message for message in chat if id(message) in selected]
+
+
+_encoding = None
+
+
+def count_tokens(messages: list) -> int:
+    # tiktoken needs its encoding file, which may not be available offline, so fall back to ~4 characters per token
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("o200k_base")
+        except Exception:
+            _encoding = False
+    text = [message.content if isinstance(message.content, str) else str(message.content) for message in messages]
+    if _encoding:
+        return sum(len(_encoding.encode(part)) for part in text)
+    return sum(len(part) for part in text) // 4
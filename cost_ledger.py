@@ -0,0 +1,230 @@
+import atexit
+import json
+import os
+import threading
+import time
+
+from tracing import current_run
+
+try:
+    import fcntl
+except ImportError:  # Windows, appends are then only safe within one process
+    fcntl = None
+
+# Model pricing: Dollars per million tokens, keyed by the model names the API returns
+PRICING = {
+    "gpt-4o-2024-11-20": {"input_cost": 2.75, "output_cost": 11},
+    "gpt-4o-2024-08-06": {"input_cost": 2.75, "output_cost": 11},
+    "o1-2024-12-17": {"input_cost": 16.5, "output_cost": 66},
+    "o1-mini-2024-09-12": {"input_cost": 1.21, "output_cost": 4.84},
+}
+
+# Used for models missing from the pricing table
+DEFAULT_MODEL = "gpt-4o-2024-11-20"
+
+
+def message_usage(message) -> tuple[int, int]:
+    token_usage = message.response_metadata.get("token_usage")
+    if token_usage:
+        return token_usage.get("prompt_tokens", 0), token_usage.get("completion_tokens", 0)
+    # Streamed responses only carry usage_metadata
+    usage = getattr(message, "usage_metadata", None) or {}
+    return usage.get("input_tokens", 0), usage.get("output_tokens", 0)
+
+
+class CostLedger:
+    """
+    Thread-safe LLM cost accounting.
+
+    Every priced call is aggregated in memory per model, run and task, so queries never
+    read the ledger file. Records are buffered and appended to a JSONL ledger in a
+    single locked write every flush_every records or flush_interval seconds, which keeps
+    concurrent runs and processes from interleaving. The summary in the old costs.json
+    layout holds the cumulative totals of the whole ledger, i.e. of all processes and
+    earlier sessions. It is built from the ledger lines added since the last flush and
+    replaced atomically while the ledger is still locked, so the last writer has seen
+    every record. A costs.json that predates the ledger is carried over into it once.
+
+    Args:
+        ledger_path (str): JSONL file the call records are appended to.
+        summary_path (str): JSON file with the totals per model, None for no summary.
+        pricing (dict): Dollars per million input and output tokens per model.
+    """
+
+    def __init__(self, ledger_path: str = "costs.jsonl", summary_path: str | None = "costs.json",
+                 pricing: dict | None = None, flush_every: int = 50, flush_interval: float = 5.0):
+        self.ledger_path = ledger_path
+        self.summary_path = summary_path
+        self.pricing = PRICING if pricing is None else pricing
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.lock = threading.Lock()
+        self.write_lock = threading.Lock()
+        self.pending: list[str] = []
+        self.last_flush = time.monotonic()
+        self.totals = {"model": {}, "run": {}, "task": {}, "agent": {}}
+        self.unpriced = set()
+        # Totals per model of everything in the ledger file, read up to ledger_offset
+        self.history: dict[str, dict] = {}
+        self.ledger_offset = 0
+
+    def price(self, model: str, input_tokens: int, output_tokens: int) -> float:
+        pricing = self.pricing.get(model)
+        if pricing is None:
+            if model not in self.unpriced:
+                self.unpriced.add(model)
+                print(f"No pricing for model '{model}', using {DEFAULT_MODEL} prices.")
+            pricing = self.pricing[DEFAULT_MODEL]
+        return (pricing["input_cost"] * input_tokens + pricing["output_cost"] * output_tokens) / 1_000_000
+
+    def record(self, model: str, input_tokens: int, output_tokens: int, agent: str = "") -> dict:
+        run = current_run()
+        record = {
+            "t": round(time.time(), 3),
+            "run": run,
+            "task": run.split("/")[0],
+            "agent": agent,
+            "model": model,
+            "in": input_tokens,
+            "out": output_tokens,
+            "cost": round(self.price(model, input_tokens, output_tokens), 8),
+        }
+        with self.lock:
+            for key in self.totals:
+                entry = self.totals[key].setdefault(record[key], {"calls": 0, "input_tokens": 0, "output_tokens": 0, "cost": 0.0})
+                entry["calls"] += 1
+                entry["input_tokens"] += input_tokens
+                entry["output_tokens"] += output_tokens
+                entry["cost"] += record["cost"]
+            self.pending.append(json.dumps(record, separators=(",", ":")))
+            due = len(self.pending) >= self.flush_every or time.monotonic() - self.last_flush >= self.flush_interval
+        if due:
+            self.flush()
+        return record
+
+    def record_messages(self, messages: list, agent: str = "") -> float:
+        # Prices every LLM response among the messages, responses replayed from the LLM cache cost nothing
+        cost = 0.0
+        for message in messages:
+            if message.type != "ai" or message.response_metadata.get("cached"):
+                continue
+            input_tokens, output_tokens = message_usage(message)
+            if input_tokens or output_tokens:
+                model = message.response_metadata.get("model_name", "") or DEFAULT_MODEL
+                cost += self.record(model, input_tokens, output_tokens, agent)["cost"]
+        return cost
+
+    def query(self, by: str = "model", key: str | None = None):
+        """
+        Returns the totals (calls, input_tokens, output_tokens, cost) grouped by model,
+        run, task or agent, or those of one key of that grouping.
+        """
+        with self.lock:
+            if key is not None:
+                return dict(self.totals[by].get(key, {"calls": 0, "input_tokens": 0, "output_tokens": 0, "cost": 0.0}))
+            return {k: dict(v) for k, v in self.totals[by].items()}
+
+    def total_cost(self) -> float:
+        with self.lock:
+            return sum(entry["cost"] for entry in self.totals["model"].values())
+
+    def summary(self) -> dict:
+        # Cumulative over the whole ledger as of the last flush, the query methods only cover this process
+        with self.lock:
+            totals = {model: dict(entry) for model, entry in self.history.items()}
+        summary = {"cumulative_costs": round(sum(entry["cost"] for entry in totals.values()), 6)}
+        for model, entry in totals.items():
+            summary[model] = {
+                "input_costs": round(entry["input_cost"], 6),
+                "output_costs": round(entry["output_cost"], 6),
+                "total_costs": round(entry["cost"], 6),
+                "input_tokens": entry["input_tokens"],
+                "output_tokens": entry["output_tokens"],
+            }
+        return summary
+
+    def legacy_records(self) -> list[str]:
+        # The totals of a costs.json written before there was a ledger, as one record per model
+        if not self.summary_path or not os.path.exists(self.summary_path):
+            return []
+        try:
+            with open(self.summary_path, "r", encoding="utf-8") as f:
+                legacy = json.load(f)
+        except (OSError, ValueError):
+            return []
+        records = []
+        for model, entry in legacy.items():
+            if isinstance(entry, dict):
+                records.append(json.dumps({
+                    "t": round(time.time(), 3), "run": "legacy", "task": "legacy", "agent": "", "model": model,
+                    "in": entry.get("input_tokens", 0), "out": entry.get("output_tokens", 0),
+                    "cost": entry.get("total_costs", 0.0),
+                    "in_cost": entry.get("input_costs", 0.0), "out_cost": entry.get("output_costs", 0.0),
+                }, separators=(",", ":")))
+        return records
+
+    def read_ledger(self, fd: int):
+        # Adds the ledger lines past ledger_offset to the history, including those of other processes
+        os.lseek(fd, self.ledger_offset, os.SEEK_SET)
+        chunks = []
+        while chunk := os.read(fd, 1 << 20):
+            chunks.append(chunk)
+        data = b"".join(chunks)
+        # Every write ends with a newline, anything after the last one is not complete yet
+        data = data[:data.rfind(b"\n") + 1]
+        with self.lock:
+            for line in data.splitlines():
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                entry = self.history.setdefault(record["model"], {
+                    "calls": 0, "input_tokens": 0, "output_tokens": 0, "input_cost": 0.0, "output_cost": 0.0, "cost": 0.0,
+                })
+                entry["calls"] += 1
+                # Only carried-over records have their own split, the others are priced from their tokens
+                entry["input_cost"] += record.get("in_cost", self.price(record["model"], record["in"], 0))
+                entry["output_cost"] += record.get("out_cost", self.price(record["model"], 0, record["out"]))
+                entry["input_tokens"] += record["in"]
+                entry["output_tokens"] += record["out"]
+                entry["cost"] += record["cost"]
+        self.ledger_offset += len(data)
+
+    def flush(self):
+        # write_lock keeps flushes in order, lock is only held to take the pending records
+        with self.write_lock:
+            with self.lock:
+                lines, self.pending = self.pending, []
+                self.last_flush = time.monotonic()
+            if not lines:
+                return
+            fd = os.open(self.ledger_path, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                # One write under an exclusive lock, so records of other processes never interleave
+                if fcntl is not None:
+                    fcntl.flock(fd, fcntl.LOCK_EX)
+                if os.fstat(fd).st_size == 0:
+                    lines = self.legacy_records() + lines
+                data = ("\n".join(lines) + "\n").encode("utf-8")
+                while data:
+                    data = data[os.write(fd, data):]
+                os.fsync(fd)
+                if self.summary_path:
+                    self.read_ledger(fd)
+                    tmp_path = f"{self.summary_path}.{os.getpid()}.tmp"
+                    with open(tmp_path, "w", encoding="utf-8") as f:
+                        json.dump(self.summary(), f, indent=4)
+                    os.replace(tmp_path, self.summary_path)
+            finally:
+                os.close(fd)
+
+    def print_summary(self):
+        for model, entry in sorted(self.query("model").items()):
+            print(f"  {model}: {entry['calls']} calls, {entry['input_tokens']} in / {entry['output_tokens']} out, "
+                  f"${entry['cost']:.4f}")
+        print(f"  Total: ${self.total_cost():.4f}")
+
+
+# Shared by all agents in this process, flushed on exit
+cost_ledger = CostLedger()
+atexit.register(cost_ledger.flush)
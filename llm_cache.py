@@ -0,0 +1,177 @@
+import contextlib
+import contextvars
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+from langchain_core.caches import BaseCache
+from langchain_core.load import dumps, loads
+
+MODES = ("off", "read_through", "record", "replay")
+
+# Connection settings that do not change the response, and may hold the API key
+IGNORED_LLM_FIELDS = {"default_headers", "openai_api_key", "openai_api_base", "http_client", "http_async_client"}
+
+# Message fields that differ between otherwise identical conversations
+IGNORED_MESSAGE_FIELDS = {"id", "response_metadata", "usage_metadata"}
+
+_scope = contextvars.ContextVar("llm_cache_scope", default="")
+
+
+class CacheMissError(LookupError):
+    """Raised in replay mode when a request has no recorded response."""
+
+
+@contextlib.contextmanager
+def cache_scope(name: str):
+    """
+    Separates cache entries of repeated runs of the same task. Without a scope, every
+    run of a task would get the responses recorded for the first one. Nested scopes
+    extend the enclosing one, e.g. run-0/candidate-1.
+    """
+    token = _scope.set(f"{_scope.get()}/{name}" if _scope.get() else str(name))
+    try:
+        yield
+    finally:
+        _scope.reset(token)
+
+
+def normalize_prompt(prompt: str) -> str:
+    # Keeps what the model sees (type, content, tool calls) and drops ids and usage metadata
+    def strip(value):
+        if isinstance(value, dict):
+            if value.get("type") == "constructor" and isinstance(value.get("kwargs"), dict):
+                value = dict(value, kwargs={
+                    k: v for k, v in value["kwargs"].items() if k not in IGNORED_MESSAGE_FIELDS
+                })
+            return {k: strip(v) for k, v in value.items()}
+        if isinstance(value, list):
+            return [strip(v) for v in value]
+        return value
+
+    try:
+        return json.dumps(strip(json.loads(prompt)), sort_keys=True)
+    except ValueError:
+        return prompt
+
+
+def normalize_llm_string(llm_string: str) -> str:
+    # The serialized model before "---" carries the endpoint and key, the rest is the call parameters
+    serialized, sep, params = llm_string.partition("---")
+    try:
+        model = json.loads(serialized)
+    except ValueError:
+        return llm_string
+    kwargs = {k: v for k, v in model.get("kwargs", {}).items() if k not in IGNORED_LLM_FIELDS}
+    return json.dumps({"id": model.get("id"), "kwargs": kwargs}, sort_keys=True) + sep + params
+
+
+class LLMResponseCache:
+    """
+    Persistent cache of chat model responses in SQLite.
+
+    Modes:
+        off: Every request goes to the model.
+        read_through: Recorded responses are reused, misses go to the model and are recorded.
+        record: Every request goes to the model and its response is recorded, replacing
+            any earlier one.
+        replay: Only recorded responses are used, a miss raises CacheMissError, so runs
+            work offline.
+
+    Entries are keyed by the model, its parameters (temperature, bound tools), the
+    cache scope and the message list, which includes the agent's system prompt.
+    """
+
+    def __init__(self, path: str = "llm_cache.sqlite", mode: str = "off"):
+        self.path = path
+        self.set_mode(mode)
+        self.lock = threading.Lock()
+        self.connection = None
+        self.hits = 0
+        self.misses = 0
+
+    def set_mode(self, mode: str):
+        if mode not in MODES:
+            raise ValueError(f"Unknown LLM cache mode '{mode}'. Available modes: {list(MODES)}")
+        self.mode = mode
+
+    def connect(self):
+        # Opened on first use, so the file is only created when caching is enabled
+        if self.connection is None:
+            self.connection = sqlite3.connect(self.path, check_same_thread=False)
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            with self.connection:
+                self.connection.execute(
+                    "CREATE TABLE IF NOT EXISTS responses ("
+                    "key TEXT PRIMARY KEY, model TEXT, scope TEXT, generations TEXT, created REAL)"
+                )
+        return self.connection
+
+    def key(self, model: str, prompt: str, llm_string: str) -> str:
+        parts = (model, _scope.get(), normalize_llm_string(llm_string), normalize_prompt(prompt))
+        return hashlib.sha256("\0".join(parts).encode("utf-8")).hexdigest()
+
+    def lookup(self, model: str, prompt: str, llm_string: str):
+        if self.mode in ("off", "record"):
+            return None
+        key = self.key(model, prompt, llm_string)
+        with self.lock:
+            row = self.connect().execute("SELECT generations FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        if row is None:
+            if self.mode == "replay":
+                raise CacheMissError(f"No recorded response for this {model} request in {self.path}.")
+            return None
+        generations = loads(row[0])
+        for generation in generations:
+            message = getattr(generation, "message", None)
+            if message is not None:
+                # Lets cost accounting skip responses that were not paid for again
+                message.response_metadata["cached"] = True
+        return generations
+
+    def update(self, model: str, prompt: str, llm_string: str, generations):
+        if self.mode not in ("read_through", "record"):
+            return
+        key = self.key(model, prompt, llm_string)
+        with self.lock, self.connect():
+            self.connection.execute(
+                "INSERT OR REPLACE INTO responses (key, model, scope, generations, created) VALUES (?, ?, ?, ?, ?)",
+                (key, model, _scope.get(), dumps(generations), time.time()),
+            )
+
+    def clear(self):
+        with self.lock, self.connect():
+            self.connection.execute("DELETE FROM responses")
+
+    def close(self):
+        with self.lock:
+            if self.connection is not None:
+                self.connection.close()
+                self.connection = None
+
+    def for_model(self, model: str) -> "ModelResponseCache":
+        return ModelResponseCache(self, model)
+
+
+class ModelResponseCache(BaseCache):
+    # LangChain cache interface for one model, passed to the chat model as cache=...
+    # The model name is part of the key because every deployment is reached through the same client settings
+
+    def __init__(self, store: LLMResponseCache, model: str):
+        self.store = store
+        self.model = model
+
+    def lookup(self, prompt: str, llm_string: str):
+        return self.store.lookup(self.model, prompt, llm_string)
+
+    def update(self, prompt: str, llm_string: str, return_val) -> None:
+        self.store.update(self.model, prompt, llm_string, return_val)
+
+    def clear(self, **kwargs) -> None:
+        self.store.clear()
@@ -3,13 +3,24 @@ from dotenv import load_dotenv
 import httpx
 import os
 
+from llm_cache import LLMResponseCache
+
 # Load environment variables from .env file
 load_dotenv()
 
+# Response cache shared by all chat models: off, read_through, record or replay
+response_cache = LLMResponseCache(
+    path=os.getenv("LLM_CACHE_PATH", "llm_cache.sqlite"),
+    mode=os.getenv("LLM_CACHE_MODE", "off"),
+)
+
 # Retrieve OpenAI API key from environment variables
 openai_api_key = os.getenv("OPENAI_API_KEY")
 if not openai_api_key:
-    raise ValueError("OpenAI API Key is not set. Please add it to the .env file.")
+    if response_cache.mode != "replay":
+        raise ValueError("OpenAI API Key is not set. Please add it to the .env file.")
+    # Replay never reaches the API, so it runs offline without a key
+    openai_api_key = "replay-only"
 
 
 def create_openai_llm(temperature=0.7, model="gpt-4o"):
@@ -37,14 +48,18 @@ def create_openai_llm(temperature=0.7, model="gpt-4o"):
             api_key=openai_api_key,
             default_headers={"Ocp-Apim-Subscription-Key": openai_api_key},
             http_client=http_client,
-            temperature=temperature
+            temperature=temperature,
+            cache=response_cache.for_model(model),
+            stream_usage=True  # Token usage is also reported when responses are streamed
         )
     else:
         return ChatOpenAI(
             base_url="https://aalto-openai-apigw.azure-api.net",
             api_key=openai_api_key,
             default_headers={"Ocp-Apim-Subscription-Key": openai_api_key},
-            http_client=http_client
+            http_client=http_client,
+            cache=response_cache.for_model(model),
+            stream_usage=True
         )
 
 # Single HTTP client for embeddings
@@ -0,0 +1,53 @@
+from dataclasses import dataclass, field
+
+
+@dataclass
+class NodeStart:
+    node: str
+
+
+@dataclass
+class NodeEnd:
+    node: str
+    content: str | None
+
+
+@dataclass
+class Token:
+    # A piece of an LLM response while it is being generated
+    node: str
+    text: str
+
+
+@dataclass
+class ValidatorVerdict:
+    passed: bool
+    content: str
+
+
+@dataclass
+class Iteration:
+    # A retry loop going round again, e.g. agent="validator", iteration=1 after the first failure
+    agent: str
+    iteration: int
+
+
+@dataclass
+class RunEnd:
+    responses: list
+    state: dict = field(repr=False)
+
+
+def node_of(metadata: dict) -> str:
+    # Agents run as graphs inside MAS nodes, the first namespace segment is the MAS node
+    namespace = metadata.get("langgraph_checkpoint_ns", "")
+    return namespace.split("|")[0].split(":")[0] or metadata.get("langgraph_node", "")
+
+
+def from_custom(data: dict):
+    # Events written by the MAS nodes with get_stream_writer()
+    if data.get("event") == "verdict":
+        return ValidatorVerdict(passed=data["passed"], content=data["content"])
+    if data.get("event") == "iteration":
+        return Iteration(agent=data["agent"], iteration=data["iteration"])
+    return None
@@ -1,15 +1,24 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
+from contextvars import ContextVar, copy_context
 from typing import TypedDict, Annotated, List
+import asyncio
+import threading
 from langgraph.graph import StateGraph, START, END
 from langgraph.graph.message import add_messages
 from langgraph.types import Command
-from langchain_core.messages import HumanMessage
+from langgraph.config import get_stream_writer
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage
 
 from agents.architect import architect
 from agents.engineer import engineer
 from agents.validator import validator
 from agents.scientist import scientist
 
-from utils import cost_calculator
+from chat_context import compact_chat, count_tokens
+from llm_cache import cache_scope
+from tracing import tracer, message_tokens
+from mas_events import NodeStart, NodeEnd, Token, RunEnd, node_of, from_custom
+from utils import cost_calculator, invoke_with_backoff
 
 
 # Define state schema
@@ -17,15 +26,39 @@ class TeamState(TypedDict):
     chat: Annotated[List, add_messages]
     scientist_itr: int
     validator_itr: int
+    tokens_saved: int
+    validated: bool
+    engineer_candidates: int
+    speculation: dict
+
+
+# Speculative engineer candidates update the same state from several threads
+_state_lock = threading.Lock()
+
+# Losing candidates of the current run that are still running, the run waits for them
+# before it ends so their tokens and cost are recorded within it
+_stragglers: ContextVar[list | None] = ContextVar("speculation_stragglers", default=None)
 
 
 # General agent invocation function
 def invoke_agent(agent, state: TeamState, agent_name: str, verbose=False, print_resp=False):
-    agent_response = agent.invoke({"messages": state["chat"]})
-    cost_calculator(agent_response, verbose=verbose)
+    # Each agent only sees the part of the chat its context policy selects
+    messages = compact_chat(state["chat"], agent_name)
+    if len(messages) < len(state["chat"]):
+        saved = count_tokens(state["chat"]) - count_tokens(messages)
+        with _state_lock:
+            state["tokens_saved"] = state.get("tokens_saved", 0) + saved
+    with tracer.span(agent_name, "agent", iteration=state["validator_itr"] + state["scientist_itr"]) as span:
+        agent_response = invoke_with_backoff(agent.invoke, {"messages": messages})
+        # A ReAct agent may call the model several times, e.g. the architect around its tool calls
+        span["prompt_tokens"], span["completion_tokens"] = message_tokens(agent_response["messages"][len(messages):])
+    cost_calculator(agent_response["messages"][len(messages):], agent_name, verbose=verbose)
     if print_resp:
         print(f"{agent_name} : {agent_response["messages"][-1].content}")
-    return agent_response["messages"][-1]
+    # The name tells the context policies which agent wrote the message
+    response = agent_response["messages"][-1]
+    response.name = agent_name
+    return response
 
 
 # Routing decision logic
@@ -33,6 +66,7 @@ def route(state: TeamState, agent_key: str, response, max_itr: int, success_goto
     if "PASS" in response.content or state[f"{agent_key}_itr"] >= max_itr:
         return success_goto
     state[f"{agent_key}_itr"] += 1
+    get_stream_writer()({"event": "iteration", "agent": agent_key, "iteration": state[f"{agent_key}_itr"]})
     return retry_goto
 
 
@@ -43,12 +77,72 @@ def architect_node(state: TeamState):
     return Command(goto="engineer"), state
 
 def engineer_node(state: TeamState):
-    response = invoke_agent(engineer, state, "engineer", print_resp=False)
+    if state.get("engineer_candidates", 1) > 1:
+        response = speculate_engineer(state, state["engineer_candidates"])
+    else:
+        response = invoke_agent(engineer, state, "engineer", print_resp=False)
     state["chat"].append(response)
     return Command(goto="validator"), state
 
+def speculate_engineer(state: TeamState, n_candidates: int):
+    """
+    Requests several engineer candidates at once and validates each as soon as it
+    arrives. The first candidate that passes is returned without waiting for the rest,
+    otherwise the one with the fewest issues. The validator node then gets its verdict
+    from the validation cache.
+    """
+    def generate_and_validate(idx):
+        # Own cache scope per candidate, so cached runs do not return the same candidate k times
+        with cache_scope(f"candidate-{idx}"):
+            response = invoke_agent(engineer, state, "engineer", print_resp=False)
+        return idx, response, validate(state, response.content)
+
+    pool = ThreadPoolExecutor(max_workers=n_candidates)
+    # Each candidate runs in a copy of this context, so streaming, tracing and cache scopes carry over
+    futures = [pool.submit(copy_context().run, generate_and_validate, idx) for idx in range(n_candidates)]
+    candidates, errors = [], []
+    try:
+        for future in as_completed(futures):
+            try:
+                candidates.append(future.result())
+            except Exception as e:
+                errors.append(e)
+                continue
+            if candidates[-1][2].startswith("PASS"):
+                break
+    finally:
+        # Candidates still running finish in the background, the run waits for them at its end
+        pool.shutdown(wait=False, cancel_futures=True)
+        stragglers = _stragglers.get()
+        if stragglers is not None:
+            stragglers.extend(future for future in futures if not future.done())
+
+    if not candidates:
+        raise errors[0]
+
+    idx, response, verdict = min(
+        candidates, key=lambda c: (not c[2].startswith("PASS"), len(c[2].splitlines()), c[0])
+    )
+    passed = verdict.startswith("PASS")
+    stats = state.setdefault("speculation", {"rounds": 0, "candidates": 0, "passed": 0, "paid_off": 0})
+    stats["rounds"] += 1
+    stats["candidates"] += len(candidates)
+    stats["passed"] += passed
+    # Paid off: a candidate passed although the first one, all a serial engineer would have had, failed.
+    # If the first one had not finished yet, it is unknown whether it would have passed
+    stats["paid_off"] += passed and any(c[0] == 0 and not c[2].startswith("PASS") for c in candidates)
+    return response
+
+def validate(state: TeamState, code: str) -> str:
+    with tracer.span("validator", "validator", iteration=state["validator_itr"] + state["scientist_itr"]) as span:
+        verdict = validator.validate(code)
+        span["passed"] = verdict.startswith("PASS")
+    return verdict
+
 def validator_node(state: TeamState):
-    response = validator.invoke(state["chat"][-1].content)
+    response = AIMessage(content=validate(state, state["chat"][-1].content), name="validator")
+    state["validated"] = response.content.startswith("PASS")
+    get_stream_writer()({"event": "verdict", "passed": response.content.startswith("PASS"), "content": response.content})
     #print("Validator: ", response.content)
     next_node = route(
         state=state,
@@ -86,32 +180,115 @@ mas_graph.add_edge(START, "architect")
 mas_runner = mas_graph.compile()
 
 
-# Function to run the graph
-def run_mas(user_input: str, reset_state=False):
-    if not hasattr(run_mas, "state") or reset_state:
-        run_mas.state = {
-            "chat": [],
-            "scientist_itr": 0,
-            "validator_itr": 0,
-        }
+def new_team_state(engineer_candidates: int = 1) -> TeamState:
+    return {
+        "chat": [],
+        "scientist_itr": 0,
+        "validator_itr": 0,
+        "tokens_saved": 0,
+        "validated": False,
+        "engineer_candidates": engineer_candidates,
+        "speculation": {"rounds": 0, "candidates": 0, "passed": 0, "paid_off": 0},
+    }
+
 
-    run_mas.state["chat"].append(HumanMessage(content=user_input))
+# Runs the graph on the given state and updates it in place. Separate states can run concurrently
+def run_mas_on_state(state: TeamState, user_input: str):
+    state["chat"].append(HumanMessage(content=user_input))
 
     responses = []
     last_state = None
+    stragglers = []
+    token = _stragglers.set(stragglers)
 
-    for event in mas_runner.stream(run_mas.state):
-        for role, state_update in event.items():
-            last_state = state_update
-            chat = state_update.get("chat", [])
-            if chat:
-                responses.append({"role": role, "content": chat[-1].content})
+    with tracer.span("mas", "graph") as span:
+        try:
+            for event in mas_runner.stream(state):
+                for role, state_update in event.items():
+                    last_state = state_update
+                    chat = state_update.get("chat", [])
+                    if chat:
+                        responses.append({"role": role, "content": chat[-1].content})
+        finally:
+            _stragglers.reset(token)
+            wait(stragglers)
 
-    if last_state:
-        run_mas.state.update(last_state)
+        if last_state:
+            state.update(last_state)
+        span["success"] = state["validated"]
+        span["iteration"] = state["validator_itr"] + state["scientist_itr"]
 
     return responses if responses else [{"role": "Error", "content": "Error. No response generated."}]
 
+
+async def astream_mas(user_input: str, state: TeamState = None):
+    """
+    Runs the graph and yields events as they happen: NodeStart and NodeEnd per node,
+    Token for every streamed piece of an LLM response, ValidatorVerdict, Iteration when
+    a retry loop goes round again, and finally RunEnd with the same responses run_mas returns.
+
+    Each call uses its own state (a new one unless given), so several streams can run at once.
+    """
+    if state is None:
+        state = new_team_state()
+    state["chat"].append(HumanMessage(content=user_input))
+
+    responses = []
+    last_state = None
+    # Opened and closed by hand, a with block cannot span the yields of an async generator
+    span = tracer.open("mas", "graph")
+    stragglers = []
+    token = _stragglers.set(stragglers)
+
+    try:
+        async for mode, chunk in mas_runner.astream(state, stream_mode=["debug", "messages", "custom", "updates"]):
+            if mode == "debug":
+                if chunk["type"] == "task":
+                    yield NodeStart(chunk["payload"]["name"])
+            elif mode == "messages":
+                # Finished messages are reported by NodeEnd, only streamed chunks are tokens
+                message, metadata = chunk
+                if isinstance(message, AIMessageChunk) and message.content:
+                    yield Token(node_of(metadata), message.content)
+            elif mode == "custom":
+                event = from_custom(chunk)
+                if event is not None:
+                    yield event
+            else:
+                for role, state_update in chunk.items():
+                    last_state = state_update
+                    chat = state_update.get("chat", [])
+                    if chat:
+                        responses.append({"role": role, "content": chat[-1].content})
+                    yield NodeEnd(role, chat[-1].content if chat else None)
+    except BaseException as e:
+        # Includes a consumer stopping early (break or aclose), which raises GeneratorExit here
+        span["error"] = repr(e)
+        raise
+    finally:
+        try:
+            _stragglers.reset(token)
+        except ValueError:
+            # Resumed from another context than the one that started the stream
+            _stragglers.set(None)
+        if stragglers:
+            await asyncio.gather(*map(asyncio.wrap_future, stragglers), return_exceptions=True)
+        if last_state:
+            state.update(last_state)
+        span["success"] = state["validated"]
+        span["iteration"] = state["validator_itr"] + state["scientist_itr"]
+        tracer.close(span)
+
+    yield RunEnd(responses if responses else [{"role": "Error", "content": "Error. No response generated."}], state)
+
+
+# Function to run the graph
+def run_mas(user_input: str, reset_state=False):
+    if not hasattr(run_mas, "state") or reset_state:
+        run_mas.state = new_team_state()
+
+    return run_mas_on_state(run_mas.state, user_input)
+
 # Function to get the final response after one entire execution of the graph
 def respond(user_input: str):
     responses = run_mas(user_input)
@@ -1,91 +1,355 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from html import escape
 from typing import List
-from pydantic import json
-from multi_agent_system import run_mas
+import json
+import os
+import threading
+from chat_context import configure_context
+from cost_ledger import cost_ledger
+from llm_cache import cache_scope
+from llm_client import response_cache
+from multi_agent_system import new_team_state, run_mas_on_state
+from tracing import tracer, trace_run
+from utils import configure_rate_limit
 
-def run_tasks_and_save(tasks: List[str], filename="task_runs.json", runs_per_task=3):
+def run_single(task: str, idx: int, run_id: int, engineer_candidates: int = 1):
+    # Every run gets its own MAS state, so runs can execute concurrently
+    try:
+        # Repeated runs of a task are cached separately, so replay reproduces each of them
+        state = new_team_state(engineer_candidates)
+        run_label = f"task-{idx}/run-{run_id + 1}"
+        # Labels repeat in every batch and the ledger keeps counting, so the run's cost is the difference
+        cost_before = cost_ledger.query("run", run_label)["cost"]
+        with cache_scope(f"run-{run_id}"), trace_run(run_label):
+            responses = run_mas_on_state(state, task)  # a list of dicts: [{"role":..., "content":...}]
+        cost = cost_ledger.query("run", run_label)["cost"] - cost_before
+        print(f"  Task {idx} run {run_id + 1} done, ${cost:.4f}, "
+              f"~{state['tokens_saved']} prompt tokens saved by context compaction")
+        return {"responses": responses, "tokens_saved": state["tokens_saved"], "speculation": state["speculation"],
+                "validated": state["validated"], "cost": cost}
+    except Exception as e:
+        print(f"  Task {idx} run {run_id + 1} failed: {e}")
+        return {"responses": [{"role": "error", "content": str(e)}], "failed": True}
+
+
+# Runs finishing at the same time append to the result log one after another
+_result_log_lock = threading.Lock()
+
+
+def result_log_path(filename: str) -> str:
+    # task_runs.json -> task_runs.jsonl
+    return os.path.splitext(filename)[0] + ".jsonl"
+
+
+def append_result(log_file, task: str, run_id: int, run: dict):
+    # Synced to disk before returning, so a crash after this loses nothing of this run
+    with _result_log_lock:
+        log_file.write(json.dumps({"task": task, "run_id": run_id, "run": run}, ensure_ascii=False) + "\n")
+        log_file.flush()
+        os.fsync(log_file.fileno())
+
+
+def load_result_log(log_path: str) -> dict:
+    """
+    Reads the runs saved in a result log.
+
+    Returns:
+        dict: The run results per (task, run_id), the last record of a pair wins.
+    """
+    runs = {}
+    if not os.path.exists(log_path):
+        return runs
+    with open(log_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # A record cut short by a crash, its run is redone on resume
+            runs[(record["task"], record["run_id"])] = record["run"]
+    return runs
+
+
+def compact_results(log_path: str, filename: str, tasks: List[str] = None, runs_per_task: int = None) -> list:
+    """
+        Turns a result log into the final JSON results file, written atomically.
+
+        Args:
+            log_path (str): The JSONL result log.
+            filename (str): The name for the JSON results file.
+            tasks (List): Task order of the results, by default the order in the log.
+            runs_per_task (int): Number of runs per task, by default the highest run in the log.
+                Runs missing from the log are saved as null.
+
+        Returns:
+            list: The saved results.
+        """
+    runs = load_result_log(log_path)
+    if tasks is None:
+        tasks = list(dict.fromkeys(task for task, _ in runs))
+    if runs_per_task is None:
+        runs_per_task = max((run_id + 1 for _, run_id in runs), default=0)
+    all_data = [{"task": task, "runs": [runs.get((task, run_id)) for run_id in range(runs_per_task)]} for task in tasks]
+
+    tmp_path = filename + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(all_data, f, indent=4, ensure_ascii=False)
+    os.replace(tmp_path, filename)
+    return all_data
+
+
+def run_tasks_and_save(tasks: List[str], filename="task_runs.json", runs_per_task=3,
+                       max_concurrency=1, requests_per_minute=None, llm_cache_mode=None,
+                       context_policies=None, engineer_candidates=1, trace_path=None, resume=False):
     """
         Runs the Multi-Agent System for the specified tasks for a given number of times,
         and saves the results to a JSON file.
 
+        Every finished run is appended to a JSONL result log next to the JSON file
+        (task_runs.jsonl for task_runs.json) and synced to disk, so an interrupted
+        batch keeps its finished runs. The JSON file is compacted from the log at the end.
+
         Args:
             tasks (List): A list of task strings.
             filename (str): The name for the JSON results file.
             runs_per_task (int): Number of runs for each task
+            max_concurrency (int): Number of runs executed at the same time
+            requests_per_minute (float): Limit on LLM requests started per minute, None for no limit
+            llm_cache_mode (str): LLM response cache mode (off, read_through, record, replay),
+                None to keep the LLM_CACHE_MODE setting
+            context_policies (dict): Context compaction policy per agent, e.g. {"engineer": "full"}
+            engineer_candidates (int): Engineer candidates requested and validated in parallel per attempt
+            trace_path (str): JSONL file for the batch's trace spans. A Chrome trace (.trace.json)
+                and the aggregate report (_report.json) are written next to it. None to only print the report
+            resume (bool): Keep the runs already in the result log and only do the missing or failed ones.
+                Otherwise the log is started over
 
         """
-    all_data = []
-
-    for idx, task in enumerate(tasks, start=1):
-        task_entry = {
-            "task": task,
-            "runs": []
-        }
-        print(f"\nTask {idx} of {len(tasks)}: {task[:60].strip()}...")
-        for run_id in range(runs_per_task):
-            try:
-                responses = run_mas(task,
-                                    reset_state=True)  # should return a list of dicts: [{"role":..., "content":...}]
-                task_entry["runs"].append({"responses": responses})
-                print(f"  Run {run_id + 1} done")
-            except Exception as e:
-                print(f"  Run {run_id + 1} failed: {e}")
-                task_entry["runs"].append({"responses": [{"role": "error", "content": str(e)}]})
-        all_data.append(task_entry)
-
-    with open(filename, "w", encoding="utf-8") as f:
-        json.dump(all_data, f, indent=4, ensure_ascii=False)
+    if llm_cache_mode is not None:
+        response_cache.set_mode(llm_cache_mode)
+    if context_policies:
+        configure_context(**context_policies)
+    configure_rate_limit(requests_per_minute, burst=max_concurrency)
+    tracer.clear()
+    log_path = result_log_path(filename)
+    done = {key for key, run in load_result_log(log_path).items() if not run.get("failed")} if resume else set()
+    pending = [
+        (idx, task, run_id)
+        for idx, task in enumerate(tasks, start=1)
+        for run_id in range(runs_per_task)
+        if (task, run_id) not in done
+    ]
+    if resume:
+        print(f"\nResuming from {log_path}: {len(done)} runs already done, {len(pending)} to go")
+
+    # A record cut short by a crash must not swallow the next one
+    cut_short = False
+    if resume and os.path.exists(log_path) and os.path.getsize(log_path) > 0:
+        with open(log_path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            cut_short = f.read(1) != b"\n"
+
+    with open(log_path, "a" if resume else "w", encoding="utf-8") as log_file:
+        if cut_short:
+            log_file.write("\n")
+
+        if max_concurrency <= 1:
+            current_idx = None
+            for idx, task, run_id in pending:
+                if idx != current_idx:
+                    current_idx = idx
+                    print(f"\nTask {idx} of {len(tasks)}: {task[:60].strip()}...")
+                append_result(log_file, task, run_id, run_single(task, idx, run_id, engineer_candidates))
+        else:
+            print(f"\nRunning {len(pending)} runs of {len(tasks)} tasks with {max_concurrency} at a time")
+            with ThreadPoolExecutor(max_workers=max_concurrency) as pool:
+                futures = {
+                    pool.submit(run_single, task, idx, run_id, engineer_candidates): (task, run_id)
+                    for idx, task, run_id in pending
+                }
+                for future in as_completed(futures):
+                    task, run_id = futures[future]
+                    append_result(log_file, task, run_id, future.result())
 
+    # Results go into their (task, run) slot, so the saved order does not depend on finishing order
+    all_data = compact_results(log_path, filename, tasks, runs_per_task)
     print(f"\nAll {len(tasks)} tasks saved to {filename}")
 
+    cost_ledger.flush()
+    cost_ledger.print_summary()
+    tracer.print_report()
+    if trace_path:
+        base = os.path.splitext(trace_path)[0]
+        tracer.to_jsonl(trace_path)
+        tracer.to_chrome_trace(base + ".trace.json")
+        with open(base + "_report.json", "w", encoding="utf-8") as f:
+            json.dump(tracer.report(), f, indent=4)
+        print(f"Trace saved to {trace_path}")
 
-def convert_results_to_html(json_filename="task_runs.json", html_filename="results.html"):
+    if engineer_candidates > 1:
+        stats = [run.get("speculation", {}) for task_data in all_data for run in task_data["runs"] if run]
+        rounds = sum(s.get("rounds", 0) for s in stats)
+        paid_off = sum(s.get("paid_off", 0) for s in stats)
+        passed = sum(s.get("passed", 0) for s in stats)
+        print(f"Speculation: {rounds} engineer rounds, {passed} with a passing candidate, "
+              f"{paid_off} passed only thanks to an extra candidate")
+
+
+def iter_json_array(path: str, chunk_size: int = 1 << 16):
+    # Yields the elements of a top-level JSON array one by one, without loading the whole file
+    decoder = json.JSONDecoder()
+    with open(path, "r", encoding="utf-8") as f:
+        buffer = f.read(chunk_size).lstrip()
+        if not buffer.startswith("["):
+            raise ValueError(f"{path} does not contain a JSON array.")
+        buffer = buffer[1:]
+        eof = False
+        while True:
+            buffer = buffer.lstrip()
+            if buffer.startswith(","):
+                buffer = buffer[1:].lstrip()
+            if buffer.startswith("]"):
+                return
+            try:
+                element, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                # Read as much again as is buffered, so large elements are decoded a bounded number of times
+                more = f.read(max(chunk_size, len(buffer)))
+                eof = not more
+                buffer += more
+                continue
+            yield element
+            buffer = buffer[end:]
+
+
+def iter_result_runs(filename: str):
+    """
+    Yields (task, run_id, run) from a results JSON file, one task in memory at a time,
+    or from a JSONL result log, one run at a time.
     """
-        Converts the results from the JSON file into a structured HTML file and saves it.
+    if filename.endswith(".jsonl"):
+        # After a resume a pair has several records, as in load_result_log the last one wins.
+        # The first pass only keeps line numbers, so runs are still held one at a time
+        last_line = {}
+        with open(filename, "r", encoding="utf-8") as f:
+            for line_no, line in enumerate(f):
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                last_line[(record["task"], record["run_id"])] = line_no
+        keep = set(last_line.values())
+        with open(filename, "r", encoding="utf-8") as f:
+            for line_no, line in enumerate(f):
+                if line_no in keep:
+                    record = json.loads(line)
+                    yield record["task"], record["run_id"], record["run"]
+        return
+    for task_entry in iter_json_array(filename):
+        for run_id, run in enumerate(task_entry["runs"]):
+            if run is not None:
+                yield task_entry["task"], run_id, run
 
-        Args:
-            json_filename (str): The name of the JSON file from where to read the results.
-            html_filename (str): The name of the HTML file to be created and results saved to.
 
-        """
+HTML_STYLE = (
+    "body{font-family:sans-serif;margin:20px;}"
+    "td,th{vertical-align:top;padding:5px;border:1px solid #ccc;text-align:left;}"
+    "table{border-collapse:collapse;}"
+    "pre{white-space:pre-wrap;margin:0;}"
+    "summary{cursor:pointer;color:#555;}"
+)
+
 
-    with open(json_filename, "r", encoding="utf-8") as f:
-        task_data = json.load(f)
+def html_header(title: str) -> str:
+    return f'<html><head><meta charset="utf-8"><title>{escape(title)}</title><style>{HTML_STYLE}</style></head><body>\n'
 
-    html_parts = [
-        '<html><head><meta charset="utf-8"><style>td{vertical-align:top;white-space:pre-wrap;padding:5px;border:1px solid #ccc;}</style></head><body>']
 
-    for task_entry in task_data:
-        task_text = escape(task_entry["task"])
-        html_parts.append(f"<h3>Task:</h3><p>{task_text}</p>")
-        html_parts.append("<table>")
+def render_content(content: str, collapse_lines: int) -> str:
+    # Long messages (mostly code) start collapsed, so a page stays readable with many runs
+    text = escape(content)
+    n_lines = content.count("\n") + 1
+    if n_lines > collapse_lines:
+        return f"<details><summary>{n_lines} lines</summary><pre>{text}</pre></details>"
+    return f"<pre>{text}</pre>"
 
-        # Each run now contains a list of {"role": ..., "content": ...}
-        runs = task_entry["runs"]
-        response_lists = [run["responses"] for run in runs]
 
-        # Determine the max number of rows needed (longest run)
-        max_len = max(len(responses) for responses in response_lists)
+def format_stats(stats: dict) -> tuple[str, str, str]:
+    pass_rate = f"{stats['validated'] / stats['known']:.0%}" if stats["known"] else "n/a"
+    iterations = f"{stats['iterations'] / stats['runs']:.1f}" if stats["runs"] else "n/a"
+    cost = f"${stats['cost']:.4f}" if stats["priced"] else "n/a"
+    return pass_rate, iterations, cost
+
+
+def convert_results_to_html(json_filename="task_runs.json", html_filename="results.html", collapse_lines=20):
+    """
+        Converts the results into an index page and one HTML page per task.
+
+        Results are read one task (JSON) or one run (JSONL result log) at a time and
+        written out straight away, so memory does not grow with the number of runs.
+        Task pages go into a folder next to the index, e.g. results_tasks/task-001.html.
+
+        Args:
+            json_filename (str): The results JSON file, or a JSONL result log, from where to read the results.
+            html_filename (str): The name of the HTML index file to be created.
+            collapse_lines (int): Messages longer than this many lines are shown collapsed.
+
+        """
+    pages_dir = os.path.splitext(html_filename)[0] + "_tasks"
+    os.makedirs(pages_dir, exist_ok=True)
 
-        # Pad shorter runs
-        for i in range(len(response_lists)):
-            while len(response_lists[i]) < max_len:
-                response_lists[i].append({"role": "", "content": ""})
+    # Only a few numbers per task are kept, the runs themselves go straight to the task pages
+    tasks = {}
+    for task, run_id, run in iter_result_runs(json_filename):
+        stats = tasks.get(task)
+        if stats is None:
+            page = f"task-{len(tasks) + 1:03d}.html"
+            stats = tasks[task] = {"page": page, "runs": 0, "known": 0, "validated": 0,
+                                   "iterations": 0, "priced": 0, "cost": 0.0}
+            with open(os.path.join(pages_dir, page), "w", encoding="utf-8") as f:
+                f.write(html_header(f"Task {len(tasks)}"))
+                f.write(f'<p><a href="../{escape(os.path.basename(html_filename))}">Index</a></p>'
+                        f"<h3>Task {len(tasks)}:</h3><p>{escape(task)}</p>\n")
 
-        # Create rows
-        for row_idx in range(max_len):
-            html_parts.append("<tr>")
-            for run in response_lists:
-                role = escape(run[row_idx]["role"])
-                content = escape(run[row_idx]["content"])
-                html_parts.append(f"<td>{role}</td><td>{content}</td>")
-            html_parts.append("</tr>")
+        responses = run.get("responses", [])
+        iterations = sum(1 for response in responses if response["role"] == "engineer")
+        stats["runs"] += 1
+        stats["iterations"] += iterations
+        if "validated" in run:
+            stats["known"] += 1
+            stats["validated"] += bool(run["validated"])
+        if "cost" in run:
+            stats["priced"] += 1
+            stats["cost"] += run["cost"]
 
-        html_parts.append("</table><br><hr><br>")
+        details = [f"{iterations} engineer iterations"]
+        if "validated" in run:
+            details.append("validated" if run["validated"] else "not validated")
+        if "cost" in run:
+            details.append(f"${run['cost']:.4f}")
+        parts = [f"<h4>Run {run_id + 1}</h4><p>{', '.join(details)}</p><table>"]
+        for response in responses:
+            parts.append(f"<tr><td>{escape(response['role'])}</td>"
+                         f"<td>{render_content(response['content'], collapse_lines)}</td></tr>")
+        parts.append("</table>\n")
+        with open(os.path.join(pages_dir, stats["page"]), "a", encoding="utf-8") as f:
+            f.write("".join(parts))
 
-    html_parts.append("</body></html>")
+    for stats in tasks.values():
+        pass_rate, iterations, cost = format_stats(stats)
+        with open(os.path.join(pages_dir, stats["page"]), "a", encoding="utf-8") as f:
+            f.write(f"<hr><p>{stats['runs']} runs, pass rate {pass_rate}, "
+                    f"{iterations} engineer iterations per run, cost {cost}</p></body></html>\n")
 
     with open(html_filename, "w", encoding="utf-8") as f:
-        f.write("\n".join(html_parts))
+        f.write(html_header("Results"))
+        f.write("<table><tr><th>#</th><th>Task</th><th>Runs</th><th>Pass rate</th>"
+                "<th>Iterations per run</th><th>Cost</th></tr>\n")
+        for number, (task, stats) in enumerate(tasks.items(), start=1):
+            pass_rate, iterations, cost = format_stats(stats)
+            link = f"{os.path.basename(pages_dir)}/{stats['page']}"
+            f.write(f'<tr><td>{number}</td><td><a href="{escape(link)}">{escape(task)}</a></td>'
+                    f"<td>{stats['runs']}</td><td>{pass_rate}</td><td>{iterations}</td><td>{cost}</td></tr>\n")
+        f.write("</table></body></html>\n")
 
-    print(f"HTML output saved to {html_filename}")
\ No newline at end of file
+    print(f"HTML output saved to {html_filename} ({len(tasks)} task pages in {pages_dir})")
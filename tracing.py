@@ -0,0 +1,189 @@
+import contextlib
+import contextvars
+import json
+import math
+import os
+import threading
+import time
+
+_run = contextvars.ContextVar("trace_run", default="")
+_span = contextvars.ContextVar("trace_span", default=None)
+
+
+@contextlib.contextmanager
+def trace_run(name: str):
+    # Spans recorded inside belong to this run, e.g. one run of one task in a batch
+    token = _run.set(str(name))
+    try:
+        yield
+    finally:
+        _run.reset(token)
+
+
+def current_run() -> str:
+    return _run.get()
+
+
+def record_wait(seconds: float):
+    # Time the current span spent queued (rate limiter, backoff, validator pool) rather than working
+    span = _span.get()
+    if span is not None:
+        span["wait_s"] += seconds
+
+
+def message_tokens(messages: list) -> tuple[int, int]:
+    # Prompt and completion tokens of all LLM responses among the messages
+    prompt_tokens = completion_tokens = 0
+    for message in messages:
+        usage = getattr(message, "usage_metadata", None)
+        token_usage = getattr(message, "response_metadata", {}).get("token_usage")
+        if token_usage:
+            prompt_tokens += token_usage.get("prompt_tokens", 0)
+            completion_tokens += token_usage.get("completion_tokens", 0)
+        elif usage:
+            prompt_tokens += usage.get("input_tokens", 0)
+            completion_tokens += usage.get("output_tokens", 0)
+    return prompt_tokens, completion_tokens
+
+
+def percentile(values: list, q: float) -> float:
+    # Nearest-rank percentile, q in [0, 100]
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+
+
+class Tracer:
+    """
+    Records spans of MAS execution (graph runs, agent calls, validations) from any
+    number of threads and concurrent runs.
+
+    Every span has wall time, wait time, prompt and completion tokens, the retry
+    iteration it belongs to and any extra attributes set while it is open. Only the
+    first span_limit spans are kept, so long sessions do not grow without bound.
+    """
+
+    def __init__(self, span_limit: int = 100_000):
+        self.span_limit = span_limit
+        self.spans: list[dict] = []
+        self.lock = threading.Lock()
+        self.origin = time.perf_counter()
+
+    def open(self, name: str, category: str, **attributes) -> dict:
+        return {
+            "name": name,
+            "category": category,
+            "run": _run.get(),
+            "thread": threading.get_ident(),
+            "start": time.perf_counter() - self.origin,
+            "wall_s": 0.0,
+            "wait_s": 0.0,
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+            "iteration": 0,
+            **attributes,
+        }
+
+    def close(self, span: dict):
+        span["wall_s"] = time.perf_counter() - self.origin - span["start"]
+        with self.lock:
+            if len(self.spans) < self.span_limit:
+                self.spans.append(span)
+
+    @contextlib.contextmanager
+    def span(self, name: str, category: str, **attributes):
+        # Use open/close directly where a with block would span an async generator's yields
+        span = self.open(name, category, **attributes)
+        token = _span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span["error"] = repr(e)
+            raise
+        finally:
+            _span.reset(token)
+            self.close(span)
+
+    def clear(self):
+        with self.lock:
+            self.spans = []
+
+    def report(self) -> dict:
+        with self.lock:
+            spans = list(self.spans)
+
+        agents = {}
+        for span in spans:
+            if span["category"] != "graph":
+                agents.setdefault(span["name"], []).append(span)
+        per_agent = {
+            name: {
+                "calls": len(group),
+                "p50_s": percentile([s["wall_s"] for s in group], 50),
+                "p95_s": percentile([s["wall_s"] for s in group], 95),
+                "wait_s": sum(s["wait_s"] for s in group),
+                "prompt_tokens": sum(s["prompt_tokens"] for s in group),
+                "completion_tokens": sum(s["completion_tokens"] for s in group),
+            }
+            for name, group in sorted(agents.items())
+        }
+
+        runs = [span for span in spans if span["category"] == "graph"]
+        successes = sum(1 for span in runs if span.get("success"))
+        total_tokens = sum(s["prompt_tokens"] + s["completion_tokens"] for s in spans if s["category"] != "graph")
+        return {
+            "runs": len(runs),
+            "successful_components": successes,
+            "run_p50_s": percentile([s["wall_s"] for s in runs], 50),
+            "run_p95_s": percentile([s["wall_s"] for s in runs], 95),
+            "total_tokens": total_tokens,
+            "tokens_per_successful_component": total_tokens / successes if successes else None,
+            "agents": per_agent,
+        }
+
+    def print_report(self):
+        report = self.report()
+        print(f"\n{report['runs']} runs, {report['successful_components']} validated components, "
+              f"run time p50 {report['run_p50_s']:.1f} s, p95 {report['run_p95_s']:.1f} s")
+        if report["tokens_per_successful_component"] is not None:
+            print(f"Tokens per validated component: {report['tokens_per_successful_component']:.0f}")
+        for name, row in report["agents"].items():
+            print(f"  {name:<10} {row['calls']:>5} calls  p50 {row['p50_s']:7.2f} s  p95 {row['p95_s']:7.2f} s  "
+                  f"wait {row['wait_s']:7.2f} s  tokens {row['prompt_tokens']} in / {row['completion_tokens']} out")
+
+    def to_jsonl(self, path: str):
+        with self.lock:
+            spans = list(self.spans)
+        with open(path, "w", encoding="utf-8") as f:
+            for span in spans:
+                f.write(json.dumps(span, default=str) + "\n")
+
+    def to_chrome_trace(self, path: str):
+        # Complete ("X") events in microseconds, one track per run, viewable in chrome://tracing or Perfetto
+        with self.lock:
+            spans = list(self.spans)
+        pid = os.getpid()
+        tracks = {}
+        trace = []
+        for span in sorted(spans, key=lambda s: s["start"]):
+            tid = tracks.setdefault(span["run"] or span["thread"], len(tracks))
+            args = {k: v for k, v in span.items() if k not in ("name", "category", "start", "wall_s", "thread")}
+            trace.append({
+                "name": span["name"],
+                "cat": span["category"],
+                "ph": "X",
+                "ts": span["start"] * 1e6,
+                "dur": span["wall_s"] * 1e6,
+                "pid": pid,
+                "tid": tid,
+                "args": args,
+            })
+        for track, tid in tracks.items():
+            trace.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": str(track)}})
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": trace, "displayTimeUnit": "ms"}, f, default=str)
+
+
+# Shared by all MAS runs in this process
+tracer = Tracer()
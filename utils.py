@@ -1,85 +1,96 @@
-import os
-import json
+import random
+import threading
+import time
 
-def cost_calculator(response, file_name="costs.json", verbose=False):
+from cost_ledger import cost_ledger
+from tracing import record_wait
+
+def cost_calculator(messages, agent_name="", verbose=False):
     """
-    Extracts token usage, calculates costs, updates cumulative costs per model,
-    and maintains an overall cumulative cost across all models.
+    Prices the LLM responses among the messages and adds them to the shared cost ledger.
 
     Args:
-        response (dict): The API response containing messages and metadata.
-        file_name (str): The name of the file where cumulative costs are stored.
+        messages (list): Messages returned by an agent call, only AI messages with token usage are priced.
+        agent_name (str): The agent that made the calls.
         verbose (binary): The condition if the cost details are printed
 
-
     Returns:
-        dict: A dictionary containing updated cumulative costs per model and overall.
+        float: The cost of these calls in dollars.
+    """
+    cost = cost_ledger.record_messages(messages, agent=agent_name)
+    if verbose:
+        print(f"Call Cost: ${cost:.6f} | Cumulative Cost: ${cost_ledger.total_cost():.6f}")
+    return cost
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket that limits how many LLM requests start per minute.
+
+    Args:
+        requests_per_minute (float): Sustained request rate.
+        burst (int): Number of requests that may start back to back.
     """
-    try:
-        ai_message = response["messages"][-1]
-        model = ai_message.response_metadata.get("model_name", "")
-
-        # Model pricing: Dollars per million tokens
-        model_pricing = {
-            "gpt-4o-2024-08-06": {"input_cost": 2.75, "output_cost": 11},
-            "gpt-o1-2024-12-17": {"input_cost": 16.5, "output_cost": 66},
-            "gpt-o1-mini-2024-09-12": {"input_cost": 1.21, "output_cost": 4.84},
-        }
-
-        # Get cost per model (0 if unknown model)
-        unit_input_cost = model_pricing.get(model, {}).get("input_cost", 2.75)
-        unit_output_cost = model_pricing.get(model, {}).get("output_cost", 11)
-
-        # Extract token usage
-        token_usage = ai_message.response_metadata.get("token_usage", {})
-        input_tokens = token_usage.get("prompt_tokens", 0)
-        output_tokens = token_usage.get("completion_tokens", 0)
-
-        # Calculate costs
-        input_costs = (unit_input_cost * input_tokens) / 1_000_000
-        output_costs = (unit_output_cost * output_tokens) / 1_000_000
-        total_costs = input_costs + output_costs
-
-        # Format cost data
-        new_cost_data = {
-            "input_costs": round(input_costs, 6),
-            "output_costs": round(output_costs, 6),
-            "total_costs": round(total_costs, 6)
-        }
-
-        # Load existing cost data or initialize if file does not exist
-        if os.path.exists(file_name):
-            with open(file_name, "r", encoding="utf-8") as file:
-                try:
-                    existing_data = json.load(file)
-                except json.JSONDecodeError:
-                    existing_data = {}
-        else:
-            existing_data = {}
-
-        # Check if cumulative cost entry exists
-        existing_data.setdefault("cumulative_costs", 0)
-        existing_data.setdefault(model, {"input_costs": 0, "output_costs": 0, "total_costs": 0})
-
-        # Update per-model costs
-        existing_data[model]["input_costs"] += new_cost_data["input_costs"]
-        existing_data[model]["output_costs"] += new_cost_data["output_costs"]
-        existing_data[model]["total_costs"] += new_cost_data["total_costs"]
-
-        # Update cumulative total cost across all models
-        existing_data["cumulative_costs"] += new_cost_data["total_costs"]
-
-        # Save updated data to file
-        with open(file_name, "w", encoding="utf-8") as file:
-            json.dump(existing_data, file, indent=4)
-
-        # Print formatted cost summary
-        if verbose:
-            return print(f"Call Cost: ${new_cost_data['total_costs']:.6f} | "
-                  f"Model Total Cost ({model}): ${existing_data[model]['total_costs']:.6f} | "
-                  f"Cumulative Cost: ${existing_data['cumulative_costs']:.6f}")
-
-    except (IndexError, AttributeError, TypeError, KeyError) as e:
-        print(f"Error: {e}")
-        return None
 
+    def __init__(self, requests_per_minute: float, burst: int = 1):
+        self.rate = requests_per_minute / 60.0
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+# Shared by every thread that calls the LLM, None means no throttling
+rate_limiter = None
+
+
+def configure_rate_limit(requests_per_minute=None, burst=1):
+    global rate_limiter
+    rate_limiter = TokenBucket(requests_per_minute, burst) if requests_per_minute else None
+
+
+def is_rate_limit_error(error) -> bool:
+    status = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+    return status == 429 or type(error).__name__ == "RateLimitError"
+
+
+def invoke_with_backoff(invoke, *args, max_retries=5, base_delay=2.0, max_delay=60.0, **kwargs):
+    """
+    Calls an LLM invoke function through the rate limiter, retrying with exponential
+    backoff and jitter when the API answers 429 Too Many Requests.
+
+    Args:
+        invoke (callable): The function making the request, e.g. agent.invoke.
+        max_retries (int): Number of retries after rate limit errors.
+        base_delay (float): Delay before the first retry in seconds.
+        max_delay (float): Upper bound of a single delay in seconds.
+
+    Returns:
+        The return value of invoke.
+    """
+    for attempt in range(max_retries + 1):
+        if rate_limiter is not None:
+            t0 = time.perf_counter()
+            rate_limiter.acquire()
+            record_wait(time.perf_counter() - t0)
+        try:
+            return invoke(*args, **kwargs)
+        except Exception as e:
+            if not is_rate_limit_error(e) or attempt == max_retries:
+                raise
+            delay = min(max_delay, base_delay * 2 ** attempt) * random.uniform(0.5, 1.0)
+            print(f"Rate limited, retrying in {delay:.1f} s ({attempt + 1}/{max_retries})")
+            time.sleep(delay)
+            record_wait(delay)
@@ -1,12 +1,26 @@
+import os
 import sys
+import types
 import importlib.util
 import json
 import math
 import random
 import inspect
+import select
+import signal
+import time
+import tracemalloc
 
 from PythonSim.classes import Component, PowerPort, SignalPort
 
+# Performance budgets for step() + update_signal_ports(), overridable through the environment
+STEP_TIME_BUDGET_US = float(os.getenv("VAL_STEP_TIME_BUDGET_US", 100.0))
+STEP_ALLOC_BUDGET_BYTES = float(os.getenv("VAL_STEP_ALLOC_BUDGET_BYTES", 4096))
+STEP_GROWTH_BUDGET_BYTES = float(os.getenv("VAL_STEP_GROWTH_BUDGET_BYTES", 16))
+BENCHMARK_STEPS = int(os.getenv("VAL_BENCHMARK_STEPS", 2000))
+# Wall time the benchmark may take at most, so slow components get numbers well within the job timeout
+BENCHMARK_TIME_BUDGET_S = float(os.getenv("VAL_BENCHMARK_TIME_BUDGET_S", 2.0))
+
 def has_safe_constructor(cls):
     sig = inspect.signature(cls.__init__)
     for name, param in list(sig.parameters.items())[2:]:  # skip self, name
@@ -28,8 +42,91 @@ def connect_all_ports(component, zero_input: bool = True):
             dummy.write_signal(val)
             port.connect_port(dummy)
 
+def benchmark_component(cls, steps: int = BENCHMARK_STEPS, dt: float = 0.01,
+                        time_budget_s: float = BENCHMARK_TIME_BUDGET_S):
+    """
+    Measures the cost of step() + update_signal_ports() on a fresh instance with random inputs.
+    Each phase stops early once its share of time_budget_s is used, so a slow component is
+    measured on fewer steps instead of running into the validation timeout.
+
+    Returns:
+        dict: Mean time per step in microseconds, peak bytes allocated within a step,
+        bytes retained per step (e.g. a list that grows every step) and the timed steps.
+    """
+    comp = cls("BenchComponent")
+    connect_all_ports(comp, zero_input=False)
+    step, update = comp.step, comp.update_signal_ports
+
+    # Warm-up, timing and the two traced allocation windows get a quarter of the budget each
+    deadline = time.perf_counter() + time_budget_s / 4
+    for _ in range(min(100, steps)):  # Warm up lazy initialisation and caches
+        step(dt)
+        update()
+        if time.perf_counter() > deadline:
+            break
+
+    deadline = time.perf_counter() + time_budget_s / 4
+    timed_steps = 0
+    start = time.perf_counter()
+    while timed_steps < steps:
+        step(dt)
+        update()
+        timed_steps += 1
+        if time.perf_counter() > deadline:
+            break
+    time_us = (time.perf_counter() - start) / timed_steps * 1e6
+
+    # Allocations are traced on fewer steps since tracing slows everything down
+    alloc_steps = max(1, timed_steps // 10)
+    deadline = time.perf_counter() + time_budget_s / 4
+    tracemalloc.start()
+    try:
+        peak_bytes = 0
+        for _ in range(alloc_steps):
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            step(dt)
+            update()
+            peak_bytes = max(peak_bytes, tracemalloc.get_traced_memory()[1] - before)
+            if time.perf_counter() > deadline:
+                break
+
+        # Growth is measured over a second window so one-off allocations in the first are ignored
+        retained_start = tracemalloc.get_traced_memory()[0]
+        deadline = time.perf_counter() + time_budget_s / 4
+        growth_steps = 0
+        while growth_steps < alloc_steps:
+            step(dt)
+            update()
+            growth_steps += 1
+            if time.perf_counter() > deadline:
+                break
+        growth_bytes = (tracemalloc.get_traced_memory()[0] - retained_start) / growth_steps
+    finally:
+        tracemalloc.stop()
+
+    return {"time_us": time_us, "peak_bytes": peak_bytes, "growth_bytes": growth_bytes, "steps": timed_steps}
+
+def check_performance(cls):
+    issues = []
+    try:
+        result = benchmark_component(cls)
+    except Exception:
+        return issues  # Numerical blow-ups over long runs are not judged here
+    if result["time_us"] > STEP_TIME_BUDGET_US:
+        issues.append(f"Performance: step() + update_signal_ports() takes {result['time_us']:.1f} us per step "
+                      f"(budget {STEP_TIME_BUDGET_US:.0f} us). Avoid rebuilding arrays, lookup tables or objects inside step().")
+    if result["peak_bytes"] > STEP_ALLOC_BUDGET_BYTES:
+        issues.append(f"Performance: step() allocates up to {result['peak_bytes']:.0f} bytes per step "
+                      f"(budget {STEP_ALLOC_BUDGET_BYTES:.0f} bytes). Precompute constant data in __init__.")
+    if result["growth_bytes"] > STEP_GROWTH_BUDGET_BYTES:
+        issues.append(f"Performance: memory grows by {result['growth_bytes']:.0f} bytes per step "
+                      f"(budget {STEP_GROWTH_BUDGET_BYTES:.0f} bytes). Do not accumulate history inside the component.")
+    return issues
+
 def validate_component_class(cls):
     errors = []
+    performance_only = False
     try:
         if not has_safe_constructor(cls):
             errors.append("Missing default parameters in constructor.")
@@ -54,16 +151,21 @@ def validate_component_class(cls):
                         errors.append(f"{name} returned NaN")
             except Exception as e:
                 errors.append(f"Step/update failed on {mode} input: {e}")
+
+        # Only components that work are worth timing
+        if not errors:
+            errors += check_performance(cls)
+            # Timing depends on the machine and its load, so such a verdict is not cached
+            performance_only = bool(errors)
     except Exception as e:
         errors.append(f"Fatal error: {e}")
 
-    return {"status": "pass" if not errors else "fail", "issues": errors}
-
-def load_class_from_file(path):
-    spec = importlib.util.spec_from_file_location("mod", path)
-    mod = importlib.util.module_from_spec(spec)
-    spec.loader.exec_module(mod)
+    result = {"status": "pass" if not errors else "fail", "issues": errors}
+    if errors and performance_only:
+        result["performance_only"] = True
+    return result
 
+def find_component_class(mod):
     for attr in dir(mod):
         obj = getattr(mod, attr)
         if isinstance(obj, type) and issubclass(obj, Component) and obj is not Component:
@@ -71,7 +173,107 @@ def load_class_from_file(path):
 
     raise ValueError("No valid Component subclass found in file.")
 
+def load_class_from_file(path):
+    spec = importlib.util.spec_from_file_location("mod", path)
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    return find_component_class(mod)
+
+def load_class_from_code(code: str):
+    mod = types.ModuleType("mod")
+    exec(compile(code, "generated_component.py", "exec"), mod.__dict__)
+    return find_component_class(mod)
+
+def validate_code(code: str):
+    try:
+        return validate_component_class(load_class_from_code(code))
+    except Exception as e:
+        return {"status": "fail", "issues": [str(e)]}
+
+def apply_limits(cpu_seconds: int, memory_mb: int):
+    import resource
+    resource.setrlimit(resource.RLIMIT_CPU, (cpu_seconds, cpu_seconds + 1))
+    if memory_mb:
+        limit = memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+def run_forked_job(code: str, timeout: float, memory_mb: int):
+    # Each job runs in a forked child, so it starts with PythonSim already imported
+    # and cannot leave anything behind in the worker
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        result = {"status": "fail", "issues": ["Unknown error."]}
+        try:
+            devnull = os.open(os.devnull, os.O_RDWR)
+            for fd in (0, 1, 2):
+                os.dup2(devnull, fd)
+            apply_limits(max(1, math.ceil(timeout)), memory_mb)
+            result = validate_code(code)
+        except BaseException as e:
+            result = {"status": "fail", "issues": [f"Fatal error: {e}"]}
+        finally:
+            try:
+                with os.fdopen(write_fd, "w", encoding="utf-8") as pipe:
+                    pipe.write(json.dumps(result))
+            finally:
+                os._exit(0)
+
+    os.close(write_fd)
+    chunks = []
+    timed_out = False
+    with os.fdopen(read_fd, "rb") as pipe:
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not select.select([pipe], [], [], remaining)[0]:
+                timed_out = True
+                break
+            chunk = os.read(pipe.fileno(), 65536)
+            if not chunk:
+                break
+            chunks.append(chunk)
+
+    if timed_out:
+        os.kill(pid, signal.SIGKILL)
+    _, status = os.waitpid(pid, 0)
+
+    if timed_out:
+        return {"status": "fail", "issues": [f"Validation timed out after {timeout} s."], "transient": True}
+    try:
+        return json.loads(b"".join(chunks).decode("utf-8"))
+    except ValueError:
+        if os.WIFSIGNALED(status):
+            reason = f"killed by signal {os.WTERMSIG(status)}, possibly a resource limit"
+        else:
+            reason = f"exit code {os.WEXITSTATUS(status)}"
+        return {"status": "fail", "issues": [f"Validation process crashed ({reason})."], "transient": True}
+
+def worker_loop(timeout: float, memory_mb: int):
+    # Long-lived worker: one JSON request per line on stdin, one JSON result per line on stdout
+    try:
+        import numpy  # Pre-import what generated components commonly use
+    except ImportError:
+        pass
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        try:
+            request = json.loads(line)
+            result = run_forked_job(request["code"], request.get("timeout", timeout), memory_mb)
+        except Exception as e:
+            result = {"status": "fail", "issues": [f"Worker error: {e}"], "transient": True}
+        sys.stdout.write(json.dumps(result) + "\n")
+        sys.stdout.flush()
+
 if __name__ == "__main__":
+    if sys.argv[1:2] == ["--worker"]:
+        timeout = float(sys.argv[2]) if len(sys.argv) > 2 else 10.0
+        memory_mb = int(sys.argv[3]) if len(sys.argv) > 3 else 1024
+        worker_loop(timeout, memory_mb)
+        sys.exit(0)
+
     file_path = sys.argv[1]
     result = {"status": "fail", "issues": ["Unknown error."]}
     try: